@@ -0,0 +1,86 @@
+"""
+Benchmark of the chunk write path: PGVector.add_embeddings (ORM inserts, previous path)
+against ChunkWriter (COPY through a staging table, one transaction), on synthetic chunks
+with random vectors. No embedding call is made. Rows are written for a throw-away user
+and deleted at the end.
+
+    python -m benchmarks.bench_chunk_writes --chunks 100000
+"""
+import argparse
+import hashlib
+import random
+import time
+import uuid
+from src.config import PSYCOPG2_CONNECTION_STRING, EMBEDDING_BATCH_SIZE, CHUNK_WRITE_FLUSH_ROWS
+from src.db.chunk_writer import ChunkWriter, deferred_indexes
+from src.ingestion.loaders import delete_chunks_by_source
+from src.ingestion.pipeline import init_vector_store
+
+
+def synthetic_batches(count: int, dimension: int, user_id: str, source_id: str, batch_size: int, seed: int = 0):
+    rng = random.Random(seed)
+    # a small pool of vectors, so that generating them does not weigh in the timings
+    pool = [[rng.random() for _ in range(dimension)] for _ in range(256)]
+    for start in range(0, count, batch_size):
+        texts, vectors, metadatas = [], [], []
+        for i in range(start, min(count, start + batch_size)):
+            text = f"Chunk {i} : " + " ".join(rng.choice(["cours", "exercice", "chapitre", "lesson", "é\\t"]) for _ in range(60))
+            texts.append(text)
+            vectors.append(pool[i % len(pool)])
+            metadatas.append({
+                "source": source_id, "source_id": source_id, "file_type": "txt", "language": "fr",
+                "user_id": user_id, "chunk_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            })
+        yield texts, vectors, metadatas
+
+
+def bench_orm(vector_store, batches) -> int:
+    written = 0
+    for texts, vectors, metadatas in batches:
+        vector_store.add_embeddings(texts=texts, embeddings=vectors, metadatas=metadatas)
+        written += len(texts)
+    return written
+
+
+def bench_copy(user_id: str, batches) -> int:
+    with ChunkWriter(PSYCOPG2_CONNECTION_STRING, user_id, flush_rows=CHUNK_WRITE_FLUSH_ROWS) as writer:
+        for texts, vectors, metadatas in batches:
+            writer.write(texts, vectors, metadatas)
+    return writer.written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ORM and COPY chunk write paths")
+    parser.add_argument("--chunks", type=int, default=100000, help="Number of chunks written by each path")
+    parser.add_argument("--dimension", type=int, default=1024, help="Vector dimension (mistral-embed: 1024)")
+    parser.add_argument("--defer-indexes", action="store_true", help="Also time COPY with deferred BM25/ANN indexes")
+    args = parser.parse_args()
+
+    vector_store = init_vector_store()
+    user_id = f"bench-{uuid.uuid4()}"
+    runs = [
+        ("orm", lambda batches: bench_orm(vector_store, batches)),
+        ("copy", lambda batches: bench_copy(user_id, batches)),
+    ]
+    if args.defer_indexes:
+        def copy_deferred(batches):
+            with deferred_indexes(PSYCOPG2_CONNECTION_STRING):
+                return bench_copy(user_id, batches)
+        runs.append(("copy + deferred indexes", copy_deferred))
+
+    print(f"{args.chunks} chunks of dimension {args.dimension}, batches of {EMBEDDING_BATCH_SIZE}")
+    try:
+        for name, run in runs:
+            source_id = f"bench-{name}.txt"
+            batches = synthetic_batches(args.chunks, args.dimension, user_id, source_id, EMBEDDING_BATCH_SIZE)
+            start = time.perf_counter()
+            written = run(batches)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<26} {elapsed:8.1f} s  {written / elapsed:10.0f} chunks/s")
+    finally:
+        for name, _ in runs:
+            delete_chunks_by_source(f"bench-{name}.txt", user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Microbenchmark of the text cleaning engine (src/ingestion/cleaning.py) against the
+previous six-pass implementation, with an output equivalence check first.
+
+    python -m benchmarks.bench_cleaning --texts 20000
+"""
+import argparse
+import random
+import re
+import time
+from langchain_core.documents import Document
+from src.ingestion.cleaning import clean_text, clean_texts, clean_documents
+
+
+def legacy_clean_text(text):
+    """
+    Previous implementation of clean_text, kept as the reference output.
+    """
+    if not text:
+        return text
+    text = text.replace('\x00', '').replace('\0', '')
+    text = re.sub(r'[\x01-\x08\x0b\x0c\x0e-\x1f\x7f]', ' ', text)
+    text = re.sub(r"[\u200b\u200c\u200d\ufeff]", "", text)
+    text = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def legacy_clean_documents(docs):
+    for d in docs:
+        d.page_content = legacy_clean_text(d.page_content)
+        for key, value in d.metadata.items():
+            if isinstance(value, str):
+                d.metadata[key] = legacy_clean_text(value)
+    return docs
+
+
+# Pieces the generated texts are made of, weighted towards plain prose like real pages
+WORDS = ["le", "rapport", "annuel", "client", "the", "revenue", "été", "2024", "€", "données", "C:\\dossier\\fichier"]
+SPECIALS = [" ", "  ", "\t", "\n", "\n\n\n\n", "\r\n", "\x00", "\x07", "\x1b", "\x7f", "\u200b", "\ufeff",
+            "\\", "\\n", "\\\\", "\\x", "\\u00e9", "\u00a0"]
+
+
+def random_text(rng: random.Random, words: int, dirty: float) -> str:
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(SPECIALS) if rng.random() < dirty else rng.choice(WORDS))
+        parts.append(" ")
+    return "".join(parts)
+
+
+def check_equivalence(rng: random.Random, count: int):
+    for _ in range(count):
+        text = random_text(rng, rng.randint(0, 60), rng.choice([0.0, 0.05, 0.5, 1.0]))
+        expected = legacy_clean_text(text)
+        if clean_text(text) != expected or clean_texts([text]) != [expected]:
+            raise AssertionError(f"Different output for {text!r}")
+    for text in ["", None, "   ", "\x00", "\u200b\u200b", "\t\t", "a\\", "\\"]:
+        if clean_text(text) != legacy_clean_text(text):
+            raise AssertionError(f"Different output for {text!r}")
+    print(f"Equivalence OK on {count} random texts")
+
+
+def timed(label: str, func, baseline: float = None) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    speedup = f" (x{baseline / elapsed:.1f})" if baseline else ""
+    print(f"{label:<36} {elapsed * 1000:8.1f} ms{speedup}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_text / clean_documents")
+    parser.add_argument("--texts", type=int, default=20000, help="Number of texts (documents)")
+    parser.add_argument("--words", type=int, default=120, help="Words per text")
+    parser.add_argument("--dirty", type=float, default=0.02, help="Share of special pieces in the texts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    check_equivalence(rng, 5000)
+
+    texts = [random_text(rng, args.words, args.dirty) for _ in range(args.texts)]
+    metadata = {"source": "data/user/rapport annuel.pdf", "title": "Rapport\u200b annuel", "page": 3}
+
+    print(f"\n{args.texts} texts of {args.words} words, {args.dirty:.0%} special pieces")
+    baseline = timed("legacy clean_text", lambda: [legacy_clean_text(t) for t in texts])
+    timed("clean_text", lambda: [clean_text(t) for t in texts], baseline)
+    timed("clean_texts (batch)", lambda: clean_texts(texts), baseline)
+
+    legacy_docs = [Document(page_content=t, metadata=dict(metadata)) for t in texts]
+    docs = [Document(page_content=t, metadata=dict(metadata)) for t in texts]
+    baseline = timed("legacy clean_documents", lambda: legacy_clean_documents(legacy_docs))
+    timed("clean_documents (batch)", lambda: clean_documents(docs), baseline)
+    if [(d.page_content, d.metadata) for d in docs] != [(d.page_content, d.metadata) for d in legacy_docs]:
+        raise AssertionError("clean_documents output differs from the legacy implementation")
+
+
+if __name__ == "__main__":
+    main()
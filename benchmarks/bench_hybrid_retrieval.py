@@ -0,0 +1,142 @@
+"""
+Latency of the hybrid retrieval: EnsembleRetriever (one BM25 query, one vector query, fusion
+in Python) against PostgresHybridRetriever (BM25 + vector + RRF in one SQL statement),
+and check that both return the same ranking.
+The query embeddings are computed once beforehand, so only the retrieval is timed.
+
+On the evaluation dataset, for a user whose documents are indexed:
+
+    python -m benchmarks.bench_hybrid_retrieval --user-id <uuid> --dataset generated_dataset_ratio_0.7.json
+
+On synthetic chunks written for a throw-away user (deleted at the end):
+
+    python -m benchmarks.bench_hybrid_retrieval --synthetic-chunks 20000
+"""
+import argparse
+import hashlib
+import json
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config import PSYCOPG2_CONNECTION_STRING, EMBEDDING_DIMENSIONS, CHUNK_WRITE_FLUSH_ROWS, embeddings
+from src.db.chunk_writer import ChunkWriter
+from src.ingestion.pipeline import init_vector_store, clear_user_collection
+from src.rag import get_hybrid_retriever
+from benchmarks.bench_vector_index import describe
+
+DATASET_DIR = Path(__file__).resolve().parent.parent / "evaluation" / "dataset"
+WORDS = (
+    "contrat facture client livraison paiement garantie remboursement commande produit service "
+    "délai retard adresse compte mot passe sécurité données export import rapport analyse "
+    "budget projet équipe réunion planning objectif risque qualité audit conformité"
+).split()
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Returns the embeddings computed beforehand for the benchmark queries.
+    """
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def dataset_queries(path: str, limit: int) -> list[str]:
+    """
+    Relevant questions of an evaluation dataset.
+    """
+    dataset_path = Path(path)
+    if not dataset_path.exists():
+        dataset_path = DATASET_DIR / path
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    return [item["input"] for item in dataset if item.get("is_relevant", True)][:limit]
+
+
+def populate(user_id: str, count: int, dimension: int, queries: int, seed: int = 0):
+    """
+    Write random word chunks with random vectors for a throw-away user.
+    :return: The queries (a few words each) and their vectors
+    """
+    rng = np.random.default_rng(seed)
+    with ChunkWriter(PSYCOPG2_CONNECTION_STRING, user_id, flush_rows=CHUNK_WRITE_FLUSH_ROWS) as writer:
+        for offset in range(0, count, 5000):
+            size = min(5000, count - offset)
+            texts = [f"{' '.join(rng.choice(WORDS, size=30))} {offset + i}" for i in range(size)]
+            metadatas = [
+                {"user_id": user_id, "source_id": "synthetic.txt", "file_type": "txt",
+                 "chunk_hash": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+                for text in texts
+            ]
+            writer.write(texts, rng.normal(size=(size, dimension)).tolist(), metadatas)
+    texts = [" ".join(rng.choice(WORDS, size=3)) + f" q{i}" for i in range(queries)]
+    return texts, rng.normal(size=(queries, dimension)).tolist()
+
+
+def timed(retriever, queries):
+    """
+    Run the queries, returns the results (texts and metadata) and the latencies in ms.
+    """
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([(d.page_content, d.metadata) for d in docs])
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensemble vs fused SQL hybrid retrieval latency")
+    parser.add_argument("--user-id", help="User whose chunks are searched (with --dataset)")
+    parser.add_argument("--dataset", default="generated_dataset_ratio_0.7.json", help="Evaluation dataset (questions)")
+    parser.add_argument("--synthetic-chunks", type=int, default=0, help="Write N synthetic chunks for a throw-away user instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--weights", default="0.5,0.5", help="BM25 and vector weights")
+    args = parser.parse_args()
+
+    init_vector_store()
+    user_id = args.user_id
+    if args.synthetic_chunks:
+        user_id = f"bench-{uuid.uuid4()}"
+        queries, vectors = populate(user_id, args.synthetic_chunks, EMBEDDING_DIMENSIONS, args.queries)
+    else:
+        if not user_id:
+            parser.error("--user-id is required without --synthetic-chunks")
+        queries = dataset_queries(args.dataset, args.queries)
+        vectors = embeddings.embed_documents(queries)
+    precomputed = PrecomputedEmbeddings(dict(zip(queries, vectors)))
+    weights = [float(w) for w in args.weights.split(",")]
+
+    try:
+        print(f"{len(queries)} queries, k={args.k}, weights={weights}\n")
+        results = {}
+        for mode in ("ensemble", "fused"):
+            retriever = get_hybrid_retriever(None, user_id, k=args.k, weights=weights, mode=mode)
+            vector_retriever = retriever.vector if mode == "fused" else retriever.retrievers[1]
+            vector_retriever.embeddings = precomputed
+            timed(retriever, queries[:5])  # warm up the pools and the cache
+            results[mode], latencies = timed(retriever, queries)
+            print(f"{mode:<10} {describe(latencies)}")
+
+        ensemble, fused = results["ensemble"], results["fused"]
+        if 0 in weights:
+            # the fused retriever does not return the documents of a zero-weight component
+            ensemble = [e[:len(f)] for e, f in zip(ensemble, fused)]
+        same = sum(e == f for e, f in zip(ensemble, fused))
+        print(f"\nSame ranking for {same}/{len(queries)} queries")
+    finally:
+        if args.synthetic_chunks:
+            clear_user_collection(user_id)
+
+
+if __name__ == "__main__":
+    main()
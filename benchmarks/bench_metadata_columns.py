@@ -0,0 +1,128 @@
+"""
+EXPLAIN ANALYZE of the hot chunk queries, filtering on the cmetadata JSON (before the
+06f7618f0ba1 migration) and on the indexed user_id/source_id/chunk_hash columns (after).
+Both forms run against the same table, the migration must be applied.
+
+    python -m benchmarks.bench_metadata_columns --users 200 --chunks-per-user 500
+
+With --users > 0, synthetic chunks are written for throw-away users first and deleted
+at the end; otherwise the queries target the existing rows of --user-id.
+"""
+import argparse
+import hashlib
+import random
+import time
+import uuid
+import psycopg2
+from src.config import PSYCOPG2_CONNECTION_STRING
+from src.db.chunk_writer import ChunkWriter
+from src.ingestion.pipeline import init_vector_store
+
+# (name, query on cmetadata, query on the columns); parameters: user_id, source_id, chunk_hash
+QUERIES = [
+    (
+        "chunk_hash_lookup",
+        "SELECT 1 FROM langchain_pg_embedding WHERE cmetadata->>'chunk_hash' = %(chunk_hash)s AND cmetadata->>'user_id' = %(user_id)s LIMIT 1",
+        "SELECT 1 FROM langchain_pg_embedding WHERE chunk_hash = %(chunk_hash)s AND user_id = %(user_id)s LIMIT 1",
+    ),
+    (
+        "get_existing_chunk_hashes",
+        "SELECT DISTINCT cmetadata->>'chunk_hash' FROM langchain_pg_embedding WHERE cmetadata->>'source_id' = %(source_id)s AND cmetadata->>'user_id' = %(user_id)s",
+        "SELECT DISTINCT chunk_hash FROM langchain_pg_embedding WHERE source_id = %(source_id)s AND user_id = %(user_id)s",
+    ),
+    (
+        "delete_chunks_by_source",
+        "DELETE FROM langchain_pg_embedding WHERE cmetadata->>'source_id' = %(source_id)s AND cmetadata->>'user_id' = %(user_id)s",
+        "DELETE FROM langchain_pg_embedding WHERE source_id = %(source_id)s AND user_id = %(user_id)s",
+    ),
+    (
+        "clear_user_collection",
+        "DELETE FROM langchain_pg_embedding WHERE cmetadata->>'user_id' = %(user_id)s",
+        "DELETE FROM langchain_pg_embedding WHERE user_id = %(user_id)s",
+    ),
+]
+
+
+def populate(users: int, chunks_per_user: int, files_per_user: int, dimension: int):
+    """
+    Write synthetic chunks for throw-away users. Returns the user ids.
+    """
+    rng = random.Random(0)
+    pool = [[rng.random() for _ in range(dimension)] for _ in range(64)]
+    user_ids = [f"bench-{uuid.uuid4()}" for _ in range(users)]
+    start = time.perf_counter()
+    for user_id in user_ids:
+        with ChunkWriter(PSYCOPG2_CONNECTION_STRING, user_id) as writer:
+            texts, vectors, metadatas = [], [], []
+            for i in range(chunks_per_user):
+                text = f"{user_id} chunk {i}"
+                texts.append(text)
+                vectors.append(pool[i % len(pool)])
+                metadatas.append({
+                    "user_id": user_id, "source_id": f"file-{i % files_per_user}.pdf", "file_type": "pdf",
+                    "chunk_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                })
+            writer.write(texts, vectors, metadatas)
+    print(f"{users * chunks_per_user} chunks written for {users} users in {time.perf_counter() - start:.1f}s")
+    return user_ids
+
+
+def explain(cur, query: str, params: dict):
+    """
+    EXPLAIN ANALYZE a query inside a savepoint, so DELETEs are rolled back.
+    Returns (plan root line, execution time in ms).
+    """
+    cur.execute("SAVEPOINT bench")
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+    plan = [row[0] for row in cur.fetchall()]
+    cur.execute("ROLLBACK TO SAVEPOINT bench")
+    execution = next(line for line in plan if line.startswith("Execution Time"))
+    scans = [line.strip().removeprefix("->").strip().split("  (")[0] for line in plan if "Scan" in line]
+    return ", ".join(scans) or plan[0], float(execution.split(":")[1].split()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE of the chunk queries, JSON filters vs indexed columns")
+    parser.add_argument("--users", type=int, default=200, help="Throw-away users to create (0 = use --user-id)")
+    parser.add_argument("--chunks-per-user", type=int, default=500)
+    parser.add_argument("--files-per-user", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--user-id", help="Existing user to query when --users is 0")
+    parser.add_argument("--source-id", help="Existing source file of --user-id")
+    args = parser.parse_args()
+
+    init_vector_store()
+    user_ids = populate(args.users, args.chunks_per_user, args.files_per_user, args.dimension) if args.users else []
+    try:
+        with psycopg2.connect(PSYCOPG2_CONNECTION_STRING) as conn:
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE langchain_pg_embedding")
+                cur.execute("SELECT count(*) FROM langchain_pg_embedding")
+                print(f"langchain_pg_embedding: {cur.fetchone()[0]} rows\n")
+
+                user_id = user_ids[len(user_ids) // 2] if user_ids else args.user_id
+                cur.execute(
+                    "SELECT source_id, chunk_hash FROM langchain_pg_embedding WHERE user_id = %s"
+                    + (" AND source_id = %s" if args.source_id else "") + " LIMIT 1",
+                    (user_id, args.source_id) if args.source_id else (user_id,)
+                )
+                source_id, chunk_hash = cur.fetchone()
+                params = {"user_id": user_id, "source_id": source_id, "chunk_hash": chunk_hash}
+
+                for name, before, after in QUERIES:
+                    before_plan, before_ms = explain(cur, before, params)
+                    after_plan, after_ms = explain(cur, after, params)
+                    print(name)
+                    print(f"  before  {before_ms:9.2f} ms  {before_plan}")
+                    print(f"  after   {after_ms:9.2f} ms  {after_plan}")
+            conn.rollback()
+    finally:
+        if user_ids:
+            with psycopg2.connect(PSYCOPG2_CONNECTION_STRING) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM langchain_pg_embedding WHERE user_id = ANY(%s)", (user_ids,))
+                conn.commit()
+
+
+if __name__ == "__main__":
+    main()
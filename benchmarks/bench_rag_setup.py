@@ -0,0 +1,60 @@
+"""
+Per-request setup overhead of /ask, before any retrieval or LLM call: what the API did on
+every question (init_vector_store, which rebuilds PGVector and checks the collection, then
+a new Mistral client, prompt, chains and hybrid retriever) against the process-wide
+RAGEngine (user retriever taken from its LRU). No question is sent to Mistral.
+
+    python -m benchmarks.bench_rag_setup --requests 200 --users 20
+"""
+import argparse
+import time
+import uuid
+from src.ingestion.pipeline import init_vector_store
+from src.rag import RAGEngine, build_retrieval_chain
+from benchmarks.bench_vector_index import describe
+
+
+def timed(setup, user_ids):
+    """
+    Run the setup for each request, returns the latencies in ms.
+    """
+    latencies = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        setup(user_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request setup overhead of /ask")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20, help="Distinct users asking")
+    args = parser.parse_args()
+
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    user_ids = [users[i % len(users)] for i in range(args.requests)]
+    print(f"{args.requests} requests, {args.users} users\n")
+
+    def per_request(user_id):
+        vector_store = init_vector_store()
+        build_retrieval_chain(vector_store, user_id)
+
+    def chain_only(user_id):
+        build_retrieval_chain(None, user_id)
+
+    start = time.perf_counter()
+    engine = RAGEngine()
+    print(f"{'RAGEngine startup (once)':<28} {(time.perf_counter() - start) * 1000:7.2f} ms\n")
+
+    for name, setup in (
+        ("per request (before)", per_request),
+        ("  of which chains", chain_only),
+        ("RAGEngine", engine.retriever_for),
+    ):
+        setup(user_ids[0])  # warm up imports and the connection pool
+        print(f"{name:<28} {describe(timed(setup, user_ids))}")
+
+
+if __name__ == "__main__":
+    main()
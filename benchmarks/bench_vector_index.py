@@ -0,0 +1,138 @@
+"""
+Recall vs latency of the ANN index (HNSW or IVFFlat, see src/db/vector_index.py) against
+the exact search, for several values of hnsw.ef_search / ivfflat.probes.
+Recall@k is the share of the exact top-k found by the ANN search.
+
+On the evaluation dataset, for a user whose documents are indexed (one embedding call
+per question):
+
+    python -m benchmarks.bench_vector_index --user-id <uuid> --dataset generated_dataset_ratio_0.7.json
+
+On synthetic clustered vectors written for a throw-away user (deleted at the end):
+
+    python -m benchmarks.bench_vector_index --synthetic-chunks 50000
+"""
+import argparse
+import hashlib
+import json
+import statistics
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+from src.config import PSYCOPG2_CONNECTION_STRING, EMBEDDING_DIMENSIONS, CHUNK_WRITE_FLUSH_ROWS, embeddings
+from src.db.chunk_writer import ChunkWriter, deferred_indexes
+from src.db.vector_index import VECTOR_INDEX_METHODS, get_vector_index
+from src.ingestion.pipeline import init_vector_store, clear_user_collection
+from src.rag import PostgresVectorRetriever
+
+DATASET_DIR = Path(__file__).resolve().parent.parent / "evaluation" / "dataset"
+
+
+def dataset_vectors(path: str, limit: int):
+    """
+    Embeddings of the relevant questions of an evaluation dataset.
+    """
+    dataset_path = Path(path)
+    if not dataset_path.exists():
+        dataset_path = DATASET_DIR / path
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    questions = [item["input"] for item in dataset if item.get("is_relevant", True)][:limit]
+    return embeddings.embed_documents(questions)
+
+
+def populate(user_id: str, count: int, dimension: int, clusters: int = 200, seed: int = 0):
+    """
+    Write clustered random vectors for a throw-away user, the ANN indexes are rebuilt once
+    at the end. Returns query vectors drawn around the same clusters.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    start = time.perf_counter()
+    with deferred_indexes(PSYCOPG2_CONNECTION_STRING, methods=VECTOR_INDEX_METHODS):
+        with ChunkWriter(PSYCOPG2_CONNECTION_STRING, user_id, flush_rows=CHUNK_WRITE_FLUSH_ROWS) as writer:
+            for offset in range(0, count, 5000):
+                size = min(5000, count - offset)
+                vectors = centers[rng.integers(clusters, size=size)] + rng.normal(scale=0.5, size=(size, dimension))
+                texts = [f"synthetic chunk {offset + i}" for i in range(size)]
+                metadatas = [
+                    {"user_id": user_id, "source_id": "synthetic.txt", "file_type": "txt",
+                     "chunk_hash": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+                    for text in texts
+                ]
+                writer.write(texts, vectors.tolist(), metadatas)
+    print(f"{count} chunks written and indexed in {time.perf_counter() - start:.1f}s")
+    return lambda n: (centers[rng.integers(clusters, size=n)] + rng.normal(scale=0.5, size=(n, dimension))).tolist()
+
+
+def timed(search, vectors, **kwargs):
+    """
+    Run the searches, returns the results (texts of each top-k) and the latencies in ms.
+    """
+    results, latencies = [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        docs = search(vector, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([d.page_content for d in docs])
+    return results, latencies
+
+
+def describe(latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return f"p50 {statistics.median(latencies):7.2f} ms  p95 {p95:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of the ANN index against exact search")
+    parser.add_argument("--user-id", help="User whose chunks are searched (with --dataset)")
+    parser.add_argument("--dataset", default="generated_dataset_ratio_0.7.json", help="Evaluation dataset (questions)")
+    parser.add_argument("--synthetic-chunks", type=int, default=0, help="Write N synthetic chunks for a throw-away user instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef-search", default="10,20,40,100,200,400", help="hnsw.ef_search values")
+    parser.add_argument("--probes", default="1,2,5,10,20,50", help="ivfflat.probes values")
+    args = parser.parse_args()
+
+    init_vector_store()
+    user_id = args.user_id
+    if args.synthetic_chunks:
+        user_id = f"bench-{uuid.uuid4()}"
+        vectors = populate(user_id, args.synthetic_chunks, EMBEDDING_DIMENSIONS)(args.queries)
+    else:
+        if not user_id:
+            parser.error("--user-id is required without --synthetic-chunks")
+        vectors = dataset_vectors(args.dataset, args.queries)
+
+    try:
+        index = get_vector_index()
+        if index is None:
+            print("No ANN index, create it first: python -m src.db.vector_index create")
+            return
+        print(f"{index['definition']} ({index['size']})")
+        print(f"{len(vectors)} queries, k={args.k}\n")
+
+        retriever = PostgresVectorRetriever(k=args.k, user_id=user_id)
+        timed(retriever.search_by_vector, vectors[:5], exact=True)  # warm up the cache
+        exact, latencies = timed(retriever.search_by_vector, vectors, exact=True)
+        print(f"{'exact':<16} recall@{args.k} 1.000  {describe(latencies)}")
+
+        if index["method"] == "hnsw":
+            name, values = "ef_search", [int(v) for v in args.ef_search.split(",")]
+        else:
+            name, values = "probes", [int(v) for v in args.probes.split(",")]
+        for value in values:
+            found, latencies = timed(retriever.search_by_vector, vectors, exact=False, **{name: value})
+            recall = statistics.mean(
+                len(set(a) & set(e)) / len(e) if e else 1.0 for a, e in zip(found, exact)
+            )
+            print(f"{name}={value:<{15 - len(name)}} recall@{args.k} {recall:.3f}  {describe(latencies)}")
+    finally:
+        if args.synthetic_chunks:
+            clear_user_collection(user_id)
+
+
+if __name__ == "__main__":
+    main()
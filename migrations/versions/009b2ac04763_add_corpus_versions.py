@@ -0,0 +1,36 @@
+"""add corpus_versions
+
+Revision ID: 009b2ac04763
+Revises: 4f3aedf6ac4b
+Create Date: 2026-10-18 17:22:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009b2ac04763'
+down_revision: Union[str, Sequence[str], None] = '4f3aedf6ac4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # one counter per user, incremented in the transaction of every change to the user's
+    # chunks: cached answers are keyed by it, see src/answer_cache.py
+    op.execute("""
+        CREATE TABLE corpus_versions (
+            user_id TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("corpus_versions")
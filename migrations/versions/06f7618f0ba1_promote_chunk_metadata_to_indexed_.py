@@ -0,0 +1,43 @@
+"""promote chunk metadata to indexed columns
+
+Revision ID: 06f7618f0ba1
+Revises: e28ec697bb66
+Create Date: 2026-10-18 13:05:52.214087
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '06f7618f0ba1'
+down_revision: Union[str, Sequence[str], None] = 'e28ec697bb66'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # stored generated columns: filled from cmetadata on every insert/update (existing
+    # rows are backfilled by the table rewrite), so writers keep only setting cmetadata
+    op.execute("""
+        ALTER TABLE langchain_pg_embedding
+            ADD COLUMN user_id TEXT GENERATED ALWAYS AS (cmetadata->>'user_id') STORED,
+            ADD COLUMN source_id TEXT GENERATED ALWAYS AS (cmetadata->>'source_id') STORED,
+            ADD COLUMN chunk_hash TEXT GENERATED ALWAYS AS (cmetadata->>'chunk_hash') STORED
+    """)
+    # (user_id) prefix serves the per-user filters, (user_id, source_id) the per-file
+    # diff and deletes, (user_id, chunk_hash) the lookups by hash
+    op.create_index("ix_langchain_pg_embedding_user_source", "langchain_pg_embedding", ["user_id", "source_id"])
+    op.create_index("ix_langchain_pg_embedding_user_chunk_hash", "langchain_pg_embedding", ["user_id", "chunk_hash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_langchain_pg_embedding_user_chunk_hash", table_name="langchain_pg_embedding")
+    op.drop_index("ix_langchain_pg_embedding_user_source", table_name="langchain_pg_embedding")
+    op.drop_column("langchain_pg_embedding", "chunk_hash")
+    op.drop_column("langchain_pg_embedding", "source_id")
+    op.drop_column("langchain_pg_embedding", "user_id")
@@ -0,0 +1,34 @@
+"""add ann index on chunk embeddings
+
+Revision ID: 4f3aedf6ac4b
+Revises: 06f7618f0ba1
+Create Date: 2026-10-18 14:22:07.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f3aedf6ac4b'
+down_revision: Union[str, Sequence[str], None] = '06f7618f0ba1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the default index, frozen: the schema does not depend on the environment of the
+    # upgrade. python -m src.db.vector_index rebuild|drop switches the method, the build
+    # parameters or the dimension (the same statement as index_definition() with the defaults)
+    op.execute(
+        'CREATE INDEX "ix_langchain_pg_embedding_embedding_ann" ON langchain_pg_embedding '
+        "USING hnsw ((embedding::vector(1024)) vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP INDEX IF EXISTS "ix_langchain_pg_embedding_embedding_ann"')
@@ -0,0 +1,35 @@
+"""add stat signature to document_catalog
+
+Revision ID: 73146943fade
+Revises:
+Create Date: 2026-10-18 10:12:04.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '73146943fade'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # size, exact mtime and inode of each file: a file whose stat signature is
+    # unchanged is not re-hashed during a sync; the unsigned 64-bit inode is mapped into the
+    # signed BIGINT range by DocumentCatalog.stat_signature
+    op.add_column("document_catalog", sa.Column("file_size", sa.BigInteger(), nullable=True))
+    op.add_column("document_catalog", sa.Column("mtime_ns", sa.BigInteger(), nullable=True))
+    op.add_column("document_catalog", sa.Column("inode", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("document_catalog", "inode")
+    op.drop_column("document_catalog", "mtime_ns")
+    op.drop_column("document_catalog", "file_size")
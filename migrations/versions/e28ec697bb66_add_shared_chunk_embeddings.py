@@ -0,0 +1,39 @@
+"""add shared_chunk_embeddings
+
+Revision ID: e28ec697bb66
+Revises: 73146943fade
+Create Date: 2026-10-18 11:41:27.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e28ec697bb66'
+down_revision: Union[str, Sequence[str], None] = '73146943fade'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # vectors shared between tenants, keyed only by (model, chunk_hash): no text and
+    # no user_id, the per-user rows of langchain_pg_embedding keep their own copy
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.execute("""
+        CREATE TABLE shared_chunk_embeddings (
+            model TEXT NOT NULL,
+            chunk_hash TEXT NOT NULL,
+            embedding vector NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (model, chunk_hash)
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("shared_chunk_embeddings")
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.query_cache import MemoryBackend, normalize_query
+
+
+class AnswerCache:
+    """
+    In-process cache of generated answers, keyed by (user_id, corpus version, normalized
+    question). The corpus version of a user is bumped in the transaction of every change
+    to their chunks (src/db/corpus_versions.py), so an answer is only served while the
+    documents it was generated from are unchanged; entries of older versions are never
+    looked up again and age out of the LRU.
+
+    Semantic mode (semantic_threshold > 0): on an exact miss, the question is embedded
+    (through the query embedding cache, the retrieval reuses the vector) and compared with
+    the last semantic_max_per_user questions cached for the same user and version; the
+    answer of the closest one is served if its cosine similarity reaches the threshold.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, semantic_threshold: float = 0.0,
+                 embeddings: Optional[Embeddings] = None, semantic_max_per_user: int = 256):
+        self.entries = MemoryBackend(max_entries, ttl)
+        self.semantic_threshold = semantic_threshold
+        self.embeddings = embeddings
+        self.semantic_max_per_user = semantic_max_per_user
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # user_id -> (corpus version, OrderedDict cache key -> normalized question vector)
+        self._questions: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def semantic(self) -> bool:
+        return self.semantic_threshold > 0 and self.embeddings is not None
+
+    @staticmethod
+    def _key(user_id: str, version: int, question: str) -> str:
+        return f"{user_id}:{version}:{hashlib.sha256(normalize_query(question).encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _closest(self, user_id: str, version: int, vector) -> Optional[Dict]:
+        """
+        Answer of the most similar question cached for the user and version, if close enough.
+        """
+        with self._lock:
+            current = self._questions.get(user_id)
+            if current is None or current[0] != version or not current[1]:
+                return None
+            keys = list(current[1])
+            matrix = np.stack(list(current[1].values()))
+        similarities = matrix @ self._normalize(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.semantic_threshold:
+            return None
+        return self.entries.get(keys[best])
+
+    def _remember(self, user_id: str, version: int, key: str, vector):
+        with self._lock:
+            current = self._questions.get(user_id)
+            if current is None or current[0] != version:
+                # the corpus changed: the questions of the previous version are dropped
+                current = (version, OrderedDict())
+                self._questions[user_id] = current
+            current[1][key] = self._normalize(vector)
+            current[1].move_to_end(key)
+            while len(current[1]) > self.semantic_max_per_user:
+                current[1].popitem(last=False)
+
+    def _hit(self, response: Dict, counter: str) -> Dict:
+        self._count(counter)
+        return dict(response)
+
+    def get(self, user_id: str, version: int, question: str) -> Optional[Dict]:
+        """
+        :param user_id: The user asking
+        :param version: Current corpus version of the user
+        :param question: The question
+        :return: The cached response ({"answer", "sources"}) or None
+        """
+        response = self.entries.get(self._key(user_id, version, question))
+        if response is not None:
+            return self._hit(response, "hits")
+        if self.semantic:
+            response = self._closest(user_id, version, self.embeddings.embed_query(question))
+            if response is not None:
+                return self._hit(response, "semantic_hits")
+        self._count("misses")
+        return None
+
+    async def aget(self, user_id: str, version: int, question: str) -> Optional[Dict]:
+        """
+        Async get, the question is embedded without blocking the event loop in semantic mode.
+        """
+        response = self.entries.get(self._key(user_id, version, question))
+        if response is not None:
+            return self._hit(response, "hits")
+        if self.semantic:
+            response = self._closest(user_id, version, await self.embeddings.aembed_query(question))
+            if response is not None:
+                return self._hit(response, "semantic_hits")
+        self._count("misses")
+        return None
+
+    def put(self, user_id: str, version: int, question: str, response: Dict):
+        """
+        Cache the response generated for a question against a corpus version.
+        """
+        key = self._key(user_id, version, question)
+        self.entries.set(key, dict(response))
+        if self.semantic:
+            self._remember(user_id, version, key, self.embeddings.embed_query(question))
+
+    async def aput(self, user_id: str, version: int, question: str, response: Dict):
+        key = self._key(user_id, version, question)
+        self.entries.set(key, dict(response))
+        if self.semantic:
+            self._remember(user_id, version, key, await self.embeddings.aembed_query(question))
+
+    def stats(self) -> Dict:
+        """
+        Returns the hit/miss counters of this process and the size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "max_entries": self.entries.max_entries,
+                "ttl": self.entries.ttl,
+                "semantic_threshold": self.semantic_threshold if self.semantic else None,
+            }
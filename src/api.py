@@ -1,27 +1,44 @@
 import os
 import traceback
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from src.rag import generate_response
+from src.rag import get_rag_engine
 from src.ingestion.loaders import ingest_pdf, ingest_txt, ingest_pptx, ingest_excel, ingest_csv, ingest_docx
 from src.auth import create_access_token, get_current_user, require_admin
 import shutil
 from typing import List, Optional
 import logging
 from fastapi.responses import JSONResponse
-from src.ingestion import pipeline, sync
+from fastapi.concurrency import run_in_threadpool
+from src.ingestion import pipeline
+from src.ingestion.jobs import SyncJobManager
 from src.db.conversation import Conversation
 from src.db.users import Users
-from src.config import PSYCOPG2_CONNECTION_STRING
+from src.db.connection import pool_stats
+from src.db.async_connection import async_pool_stats, close_async_pools
+from src.config import PSYCOPG2_CONNECTION_STRING, SYNC_JOB_WORKERS, query_embeddings, answer_cache
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 conversation_store = Conversation(PSYCOPG2_CONNECTION_STRING)
 user_store = Users(PSYCOPG2_CONNECTION_STRING)
+sync_jobs = SyncJobManager(max_workers=SYNC_JOB_WORKERS)
 
-app=FastAPI(title="RAG API", description="API for the RAG system with MistralAI and Postgres")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # built once for the life of the server: LLM client, chains, PGVector collection check
+    rag_engine = get_rag_engine()
+    await run_in_threadpool(pipeline.init_vector_store)
+    await rag_engine.awarm_up()
+    yield
+    await rag_engine.aclose()
+    # the async pools are bound to the event loop of the server
+    await close_async_pools()
+
+app=FastAPI(title="RAG API", description="API for the RAG system with MistralAI and Postgres", lifespan=lifespan)
 
 class RequestModel(BaseModel):
     query: str
@@ -114,12 +131,14 @@ def add_message_to_conv(conversation_id: str, req: AddMessageRequest, user: dict
     return {"status": "added"}
 
 
-@app.post("/upload-multiple")
-async def upload_multiple(files: List[UploadFile] = File(...), user: dict = Depends(get_current_user)):
+@app.post("/upload-multiple", status_code=202)
+def upload_multiple(files: List[UploadFile] = File(...), user: dict = Depends(get_current_user)):
     """
-    Endpoint to upload multiple files. Each file is saved to the "data" directory.    
+    Endpoint to upload multiple files. Each file is saved to the "data" directory,
+    then a background sync of the user's directory is enqueued.
+    Plain def: the blocking file copies run in the threadpool, not on the event loop.
     :param files: A list of files uploaded by the user
-    :return: A JSON response indicating the success or failure of the upload process
+    :return: The id of the sync job processing the files (see GET /jobs/{job_id})
     """
     try:
         user_dir = f"data/{user['sub']}"
@@ -128,31 +147,63 @@ async def upload_multiple(files: List[UploadFile] = File(...), user: dict = Depe
             path = f"{user_dir}/{file.filename}"
             with open(path, "wb") as f:
                 shutil.copyfileobj(file.file, f)
-        return {"status": "Files uploaded and processed successfully"}
+        job = sync_jobs.submit(user_dir, user["sub"])
+        return {"status": "Files uploaded, processing in background", "job_id": job["id"], "job_status": job["status"]}
     except Exception as e:
         logger.error(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
-@app.post("/sync")
+@app.post("/sync", status_code=202)
 async def sync_collection_endpoint(request: SyncRequest = None, user: dict = Depends(get_current_user)):
     """
     Endpoint to synchronize the vector store with the files in the specified directory.
+    The sync runs as a background job; a sync of the same directory already queued or
+    running for this user is returned instead of starting a new one.
     :param request: A SyncRequest object containing the directory to synchronize
-    :return: A JSON response indicating the success or failure of the synchronization process
+    :return: The id of the sync job (see GET /jobs/{job_id})
     """
     directory = request.directory if (request and request.directory) else f"data/{user['sub']}"
     try:
-        if pipeline.vector_store is None:
-            pipeline.init_vector_store()
-
-        sync.sync_collection(directory, user["sub"])
-
-        return {"status": f"Collection {os.path.basename(directory)} synchronised with success"}
+        job = sync_jobs.submit(directory, user["sub"])
+        return {
+            "status": f"Synchronisation of {os.path.basename(directory)} started",
+            "job_id": job["id"],
+            "job_status": job["status"],
+        }
     except Exception as e:
         logger.error(f"Error during synchronization: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
     
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, user: dict = Depends(get_current_user)):
+    """
+    Endpoint to follow a sync job: status, per-file progress, chunk counts and errors.
+    :param job_id: The id returned by /sync or /upload-multiple
+    :return: The job, 404 if it does not exist or belongs to another user
+    """
+    job = sync_jobs.get(job_id, user_id=user["sub"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return job
+
+@app.get("/admin/pool-stats")
+def get_pool_stats(user: dict = Depends(require_admin)):
+    """
+    Endpoint reserved for admins: usage of the database connection pools, psycopg2 (open
+    connections, checkouts, waits for a free connection, checkout durations) and psycopg 3 async.
+    """
+    return {"psycopg2": pool_stats(), "async": async_pool_stats()}
+
+@app.get("/admin/cache-stats")
+def get_cache_stats(user: dict = Depends(require_admin)):
+    """
+    Endpoint reserved for admins: hit rates and sizes of the query embedding and answer
+    caches of this worker.
+    """
+    stats = query_embeddings.stats() if hasattr(query_embeddings, "stats") else None
+    return {"query_embeddings": stats, "answers": answer_cache.stats() if answer_cache is not None else None}
+
 @app.post("/clear-collection")
 async def clear_collection_endpoint(user: dict = Depends(get_current_user)):
     """
@@ -177,12 +228,14 @@ async def ask_question(request: RequestModel, user: dict = Depends(get_current_u
     :param request: A RequestModel object containing the user's question
     :return: A response containing the answer and the sources with metadata
     """
-    pipeline.init_vector_store()
+    # initialized at startup, only retried here if the database was not reachable then
+    if pipeline.vector_store is None:
+        await run_in_threadpool(pipeline.init_vector_store)
     if pipeline.vector_store is None:
         raise HTTPException(status_code=400, detail="Please upload a PDF first via /upload")
     
     try:
-        result = generate_response(pipeline.vector_store, request.query, user["sub"])
+        result = await get_rag_engine().agenerate(request.query, user["sub"])
         answer = result["answer"]
         docs = result["sources"]
 
@@ -200,9 +253,10 @@ async def ask_question(request: RequestModel, user: dict = Depends(get_current_u
             sources.append(source_dict)
 
         if request.conversation_id:
-            if conversation_store.conversation_belongs_to_user(request.conversation_id, user["sub"]):
-                conversation_store.add_message(request.conversation_id, user["sub"], "user", request.query)
-                conversation_store.add_message(request.conversation_id, user["sub"], "assistant", answer, sources)
+            # psycopg2 calls: run in the thread pool, not on the event loop
+            if await run_in_threadpool(conversation_store.conversation_belongs_to_user, request.conversation_id, user["sub"]):
+                await run_in_threadpool(conversation_store.add_message, request.conversation_id, user["sub"], "user", request.query)
+                await run_in_threadpool(conversation_store.add_message, request.conversation_id, user["sub"], "assistant", answer, sources)
         
         return {
             "question": request.query,
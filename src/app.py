@@ -194,6 +194,36 @@ def delete_conv(conv_id):
     except Exception:
         pass
 
+def wait_for_job(job_id):
+    """Polls a sync job and shows its per-file progress until it finishes. Returns the final job."""
+    bar = st.progress(0.0, text="Synchronisation en attente...")
+    while True:
+        res = requests.get(f"{API_URL}/jobs/{job_id}", headers=auth_headers())
+        if res.status_code != 200:
+            bar.empty()
+            return None
+        job = res.json()
+        total = job["files_total"] or 1
+        bar.progress(min(job["files_done"] / total, 1.0),
+                     text=f"Synchronisation : {job['files_done']}/{job['files_total']} fichier(s)")
+        if job["status"] in ("completed", "failed"):
+            bar.empty()
+            return job
+        time.sleep(1)
+
+def show_job_result(job):
+    if job is None:
+        st.error("Erreur lors de la synchronisation.")
+        return
+    counts = job["counts"]
+    if job["status"] == "failed":
+        st.error(f"Erreur lors de la synchronisation : {job['errors'][-1]['error'] if job['errors'] else ''}")
+        return
+    st.success(f"Collection synchronisée ! {counts['added']} chunk(s) ajouté(s), "
+               f"{counts['reused']} réutilisé(s), {counts['removed']} supprimé(s).")
+    for error in job["errors"]:
+        st.warning(f"{error['source_id']} : {error['error']}")
+
 # Sidebar navigation
 with st.sidebar:
     st.markdown(f"**{st.session_state.user['email']}**")
@@ -279,18 +309,15 @@ elif st.session_state.page == "Documents":
         if st.button("Synchroniser les fichiers", type="secondary", use_container_width=True):
             new_files = [f for f in uploaded_files if f.name not in st.session_state.uploaded_names] if uploaded_files else []
             if new_files:
-                with st.spinner("Synchronisation en cours..."):
+                with st.spinner("Envoi des fichiers..."):
                     files_payload = [("files", (f.name, f.getvalue(), f.type)) for f in new_files]
                     resp = requests.post(f"{API_URL}/upload-multiple", files=files_payload, headers=auth_headers())
-                    if resp.status_code == 200:
-                        st.session_state.uploaded_names.extend([f.name for f in new_files])
-                        sync_resp = requests.post(f"{API_URL}/sync", headers=auth_headers())
-                        if sync_resp.status_code == 200:
-                            st.success("Collection synchronisée !")
-                        else:
-                            st.error("Erreur lors de la synchronisation.")
-                    else:
-                        st.error("Erreur lors de l'upload des fichiers.")
+                if resp.status_code in (200, 202):
+                    st.session_state.uploaded_names.extend([f.name for f in new_files])
+                    # the upload enqueues the sync job, we just follow it
+                    show_job_result(wait_for_job(resp.json()["job_id"]))
+                else:
+                    st.error("Erreur lors de l'upload des fichiers.")
 
     with col2:
         if st.button("Vider ma collection", type="secondary", use_container_width=True):
@@ -312,12 +339,11 @@ elif st.session_state.page == "Documents":
         )
         if st.button("Synchroniser ce dossier serveur"):
             if directory_path:
-                with st.spinner("Synchronisation en cours..."):
-                    resp = requests.post(f"{API_URL}/sync", json={"directory": directory_path}, headers=auth_headers())
-                    if resp.status_code == 200:
-                        st.success("Dossier synchronisé !")
-                    else:
-                        st.error(f"Erreur: {resp.status_code} - {resp.text}")
+                resp = requests.post(f"{API_URL}/sync", json={"directory": directory_path}, headers=auth_headers())
+                if resp.status_code in (200, 202):
+                    show_job_result(wait_for_job(resp.json()["job_id"]))
+                else:
+                    st.error(f"Erreur: {resp.status_code} - {resp.text}")
             else:
                 st.warning("Précise un chemin de dossier.")
 
@@ -1,6 +1,9 @@
 import os
 from dotenv import load_dotenv
 from langchain_mistralai import MistralAIEmbeddings
+from src.embedding_scheduler import RateLimitedEmbeddings
+from src.query_cache import CachedQueryEmbeddings, MemoryBackend, RedisBackend
+from src.answer_cache import AnswerCache
 
 load_dotenv()
 
@@ -13,6 +16,134 @@ CONNECTION_STRING = f"postgresql+psycopg2://{app_user}:{app_password}@{host}:{po
 #for psycopg2
 PSYCOPG2_CONNECTION_STRING = f"postgresql://{app_user}:{app_password}@{host}:{port}/vector_db"
 
-embeddings = MistralAIEmbeddings(model="mistral-embed")
+# Process-wide psycopg2 connection pool, see src/db/connection.py. Checkouts wait up to
+# DB_POOL_TIMEOUT seconds when all DB_POOL_MAX_SIZE connections are in use.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
 CHUNK_SIZE = 500
-CHUNK_OVERLAP = 50
\ No newline at end of file
+CHUNK_OVERLAP = 50
+
+# Embedding batching: Mistral accepts several inputs per request, bounded by a
+# token budget, so chunks are grouped instead of embedded one by one.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))
+EMBEDDING_MAX_TOKENS_PER_BATCH = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_BATCH", "16000"))
+
+# Mistral quotas for the embedding scheduler, see src/embedding_scheduler.py
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "60"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "500000"))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+
+# Every embedding call (ingestion and query time) goes through the rate-limited scheduler,
+# which owns the retries (429s, timeouts, 5xx): the client's tenacity retries are disabled (max_retries=None)
+embeddings = RateLimitedEmbeddings(
+    MistralAIEmbeddings(model="mistral-embed", max_retries=None),
+    requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+    tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+    max_in_flight=EMBEDDING_MAX_IN_FLIGHT,
+    batch_size=EMBEDDING_BATCH_SIZE,
+    max_tokens_per_batch=EMBEDDING_MAX_TOKENS_PER_BATCH,
+)
+
+# Local embedding cache keyed by (model, chunk_hash), see src/ingestion/embedding_cache.py
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Embeddings shared between users for identical chunks, see src/db/shared_embeddings.py
+SHARED_EMBEDDINGS_ENABLED = os.getenv("SHARED_EMBEDDINGS_ENABLED", "true").lower() == "true"
+
+# Number of processes parsing files in parallel during a sync (1 = sequential)
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "1"))
+
+# Hash used to detect file modifications: "sha256" or the faster non-cryptographic "xxh3_128"
+FILE_HASH_ALGORITHM = os.getenv("FILE_HASH_ALGORITHM", "sha256")
+
+# Chunk rows are written with COPY through a staging table, moved every CHUNK_WRITE_FLUSH_ROWS rows.
+CHUNK_WRITE_FLUSH_ROWS = int(os.getenv("CHUNK_WRITE_FLUSH_ROWS", "5000"))
+
+# Worker threads running background sync jobs, see src/ingestion/jobs.py
+SYNC_JOB_WORKERS = int(os.getenv("SYNC_JOB_WORKERS", "2"))
+
+# Filesystem watcher daemon, see src/ingestion/watcher.py
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+WATCH_QUEUE_SIZE = int(os.getenv("WATCH_QUEUE_SIZE", "16"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "5"))
+
+# Language detection during ingestion, see src/ingestion/language.py
+LANGUAGE_SAMPLE_CHARS = int(os.getenv("LANGUAGE_SAMPLE_CHARS", "1000"))
+LANGUAGE_BATCH_SIZE = int(os.getenv("LANGUAGE_BATCH_SIZE", "128"))
+LANGUAGE_HOMOGENEOUS_MIN_DOCS = int(os.getenv("LANGUAGE_HOMOGENEOUS_MIN_DOCS", "8"))
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "100000"))
+
+# Approximate (ANN) index on the chunk embeddings, see src/db/vector_index.py.
+# VECTOR_INDEX_METHOD: "hnsw", "ivfflat" or "none"; the index is built on embedding::vector(EMBEDDING_DIMENSIONS).
+# The migration builds the default index (hnsw, 1024 dimensions), these settings apply through the CLI
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+VECTOR_INDEX_MAINTENANCE_WORK_MEM = os.getenv("VECTOR_INDEX_MAINTENANCE_WORK_MEM", "512MB")
+# Query-time defaults of the vector retriever (overridable per query)
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+# Users with fewer chunks than this are searched exactly (no ANN index, exact recall)
+VECTOR_EXACT_SEARCH_MAX_CHUNKS = int(os.getenv("VECTOR_EXACT_SEARCH_MAX_CHUNKS", "5000"))
+# pgvector >= 0.8 only: "relaxed_order" or "strict_order" keeps scanning the index until
+# k rows pass the user filter (empty = not set, the post-filtered ANN may return fewer rows)
+VECTOR_ITERATIVE_SCAN = os.getenv("VECTOR_ITERATIVE_SCAN", "")
+
+# Optional partitioned layout of langchain_pg_embedding by user_id, see src/db/partitions.py
+# ("list": one partition per user, "hash": CHUNK_HASH_PARTITIONS partitions). Defaults of the CLI.
+CHUNK_PARTITION_METHOD = os.getenv("CHUNK_PARTITION_METHOD", "list")
+CHUNK_HASH_PARTITIONS = int(os.getenv("CHUNK_HASH_PARTITIONS", "16"))
+
+# Hybrid retrieval, see src/rag.py: "fused" computes BM25 + vector + weighted RRF in one SQL
+# statement (zero-weight components are not queried), "ensemble" runs the two retrievers
+# and fuses them with EnsembleRetriever
+HYBRID_RETRIEVER = os.getenv("HYBRID_RETRIEVER", "fused")
+HYBRID_BM25_WEIGHT = float(os.getenv("HYBRID_BM25_WEIGHT", "0.0"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_RRF_C = int(os.getenv("HYBRID_RRF_C", "60"))
+
+# Query embedding cache of the retrievers, see src/query_cache.py: in-process LRU of
+# QUERY_EMBEDDING_CACHE_MAX_ENTRIES vectors kept QUERY_EMBEDDING_CACHE_TTL seconds, shared
+# between workers through Redis when QUERY_EMBEDDING_CACHE_REDIS_URL is set (needs redis)
+QUERY_EMBEDDING_CACHE_ENABLED = os.getenv("QUERY_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", str(24 * 3600)))
+QUERY_EMBEDDING_CACHE_REDIS_URL = os.getenv("QUERY_EMBEDDING_CACHE_REDIS_URL", "")
+
+query_embeddings = embeddings
+if QUERY_EMBEDDING_CACHE_ENABLED:
+    query_embeddings = CachedQueryEmbeddings(
+        embeddings,
+        MemoryBackend(QUERY_EMBEDDING_CACHE_MAX_ENTRIES, QUERY_EMBEDDING_CACHE_TTL),
+        RedisBackend(QUERY_EMBEDDING_CACHE_REDIS_URL, QUERY_EMBEDDING_CACHE_TTL) if QUERY_EMBEDDING_CACHE_REDIS_URL else None,
+    )
+
+# Answer cache of /ask, see src/answer_cache.py: answers are reused while the user's corpus
+# version is unchanged. ANSWER_CACHE_SEMANTIC_THRESHOLD > 0 (cosine similarity, e.g. 0.97)
+# also serves the answer of a near-identical question
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0"))
+
+answer_cache = AnswerCache(
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL, ANSWER_CACHE_SEMANTIC_THRESHOLD, query_embeddings
+) if ANSWER_CACHE_ENABLED else None
+
+# Ensemble hybrid retrieval (HYBRID_RETRIEVER=ensemble): the BM25 and vector searches run
+# concurrently on a pool of RETRIEVER_THREADS threads (sync path), each one is abandoned
+# after RETRIEVER_TIMEOUT seconds and the question is answered with the other's results
+RETRIEVER_TIMEOUT = float(os.getenv("RETRIEVER_TIMEOUT", "5"))
+RETRIEVER_THREADS = int(os.getenv("RETRIEVER_THREADS", "8"))
+
+# Process-wide RAG engine of the API, see RAGEngine in src/rag.py: the LLM client and the
+# chains are built once at startup, the retrievers of the last RAG_ENGINE_MAX_USERS users are kept
+RAG_CHAT_MODEL = os.getenv("RAG_CHAT_MODEL", "open-mistral-7b")
+RAG_ENGINE_MAX_USERS = int(os.getenv("RAG_ENGINE_MAX_USERS", "1024"))
+RAG_WARMUP_TIMEOUT = float(os.getenv("RAG_WARMUP_TIMEOUT", "5"))
@@ -0,0 +1,56 @@
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from psycopg import conninfo
+from psycopg_pool import AsyncConnectionPool
+from src.config import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+
+# psycopg 3 pools of the event loop serving the API, by connection string.
+# They are bound to that loop: only use them from the coroutines of the application.
+_pools: Dict[str, AsyncConnectionPool] = {}
+
+
+async def get_async_pool(connection_string: str) -> AsyncConnectionPool:
+    """
+    Returns the async pool of a connection string, created and opened on first use.
+    """
+    pool = _pools.get(connection_string)
+    if pool is None:
+        pool = AsyncConnectionPool(
+            connection_string, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT, open=False
+        )
+        _pools[connection_string] = pool
+    # no-op once the pool is open
+    await pool.open()
+    return pool
+
+
+@asynccontextmanager
+async def async_scoped_connection(connection_string: str, user_id: Optional[str] = None):
+    """
+    Async counterpart of get_scoped_connection: checks out a psycopg 3 connection for one
+    transaction (committed on a clean exit, rolled back on error) and sets the current user
+    for RLS, local to that transaction.
+    :param user_id: The user to scope the transaction to, None for an unscoped connection
+    """
+    pool = await get_async_pool(connection_string)
+    async with pool.connection() as conn:
+        if user_id is not None:
+            await conn.execute("SELECT set_config('app.current_user_id', %s, true);", (user_id,))
+        yield conn
+
+
+async def close_async_pools():
+    """
+    Close the async pools, at application shutdown.
+    """
+    while _pools:
+        _, pool = _pools.popitem()
+        await pool.close()
+
+
+def async_pool_stats() -> Dict:
+    """
+    Returns the stats of the async pools (psycopg_pool counters), by database.
+    """
+    return {conninfo.conninfo_to_dict(cs).get("dbname"): pool.get_stats() for cs, pool in _pools.items()}
@@ -1,10 +1,23 @@
 import hashlib
+import mmap
 import os
+import xxhash
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
+from src.config import FILE_HASH_ALGORITHM
 from src.db.connection import get_scoped_connection
 
+# read buffer for hashing, files bigger than MMAP_THRESHOLD are hashed through mmap
+HASH_BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# file types picked up by scan_directory
+SCANNED_EXTENSIONS = ['.pdf', '.txt', '.pptx', '.xlsx', '.csv', '.docx']
+
+# inodes are unsigned 64-bit, stored in a signed BIGINT (see stat_signature)
+INODE_RANGE = 2 ** 64
+
 
 class DocumentCatalog:
     def __init__(self, connection_string: str):
@@ -13,36 +26,97 @@ class DocumentCatalog:
     def get_file_hash(self, file_path: str) -> str:
         """
         Calculates the hash of a file to detect modifications.
+        Uses FILE_HASH_ALGORITHM ("sha256" or the much faster non-cryptographic "xxh3_128"),
+        with large buffered reads, or mmap for big files.
         :param file_path: Path to the file
         :return: Hash of the file
         """
-        hasher = hashlib.sha256()
+        if FILE_HASH_ALGORITHM == "xxh3_128":
+            hasher = xxhash.xxh3_128()
+        else:
+            hasher = hashlib.new(FILE_HASH_ALGORITHM)
         with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hasher.update(chunk)
+            if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    hasher.update(mapped)
+            else:
+                for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
+                    hasher.update(chunk)
         return hasher.hexdigest()
+
+    @staticmethod
+    def stat_signature(stat: os.stat_result) -> Dict:
+        """
+        Returns the stat signature of a file: size, exact mtime and inode (None where unavailable).
+        The inode is an unsigned 64-bit number (NTFS file ids, some network filesystems use the
+        high bit): it is mapped into the signed range of the BIGINT column, one to one.
+        """
+        inode = stat.st_ino
+        if inode >= INODE_RANGE // 2:
+            inode -= INODE_RANGE
+        return {
+            "file_size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "inode": inode or None,
+        }
+
+    @staticmethod
+    def signature_unchanged(signature: Dict, indexed: Optional[Dict]) -> bool:
+        """
+        True if a file has the same stat signature as when it was indexed.
+        The inode is only compared when both sides have one.
+        """
+        if indexed is None or indexed.get("file_size") is None or indexed.get("mtime_ns") is None:
+            return False
+        if signature["file_size"] != indexed["file_size"] or signature["mtime_ns"] != indexed["mtime_ns"]:
+            return False
+        if signature["inode"] and indexed.get("inode"):
+            return signature["inode"] == indexed["inode"]
+        return True
+    
+    def describe_file(self, file_path: Path, directory: str, user_id: str, indexed: Optional[Dict] = None) -> Dict:
+        """
+        Builds the catalog metadata of one file. The file is only hashed if its stat
+        signature (size, mtime, inode) differs from the indexed one.
+        :param file_path: Path to the file
+        :param directory: Root directory of the user's files (source_id is relative to it)
+        :param user_id: the user this file belongs to
+        :param indexed: catalog entry of this file, if already indexed
+        """
+        stat = file_path.stat()
+        signature = self.stat_signature(stat)
+        if self.signature_unchanged(signature, indexed):
+            content_hash = indexed["content_hash"]
+        else:
+            content_hash = self.get_file_hash(str(file_path))
+            print(f"File found : {file_path}")
+        return {
+            "source_id": os.path.relpath(file_path, start=directory),
+            "user_id": user_id,
+            "file_path": str(file_path),
+            "file_type": file_path.suffix[1:].lower(),
+            "last_modified": datetime.fromtimestamp(stat.st_mtime),
+            "content_hash": content_hash,
+            **signature,
+        }
     
-    def scan_directory(self, directory: str, user_id: str) -> List[Dict]:
+    def scan_directory(self, directory: str, user_id: str, indexed_files: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Scans the directory to find files to index.
         Returns a list of dicts with file metadata.
+        Files whose stat signature (size, mtime, inode) matches the indexed one keep their
+        stored hash and are not read again, so a no-op sync only costs stat calls.
         :param directory: Path to the directory to scan
         :param user_id: the user this scan belongs to
+        :param indexed_files: files already indexed for this user (see get_indexed_files)
         """
         print(f"Scan of the directory {directory} for user {user_id}...")
+        indexed_by_source = {f["source_id"]: f for f in indexed_files or []}
         files_info = []
         for file_path in Path(directory).rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in ['.pdf', '.txt', '.pptx', '.xlsx', '.csv']:
-                stat = file_path.stat()
-                files_info.append({
-                    "source_id": os.path.relpath(file_path, start=directory),
-                    "user_id": user_id,
-                    "file_path": str(file_path),
-                    "file_type": file_path.suffix[1:].lower(),
-                    "last_modified": datetime.fromtimestamp(stat.st_mtime),
-                    "content_hash": self.get_file_hash(str(file_path))
-                })
-                print(f"File found : {file_path}")
+            if file_path.is_file() and file_path.suffix.lower() in SCANNED_EXTENSIONS:
+                source_id = os.path.relpath(file_path, start=directory)
+                files_info.append(self.describe_file(file_path, directory, user_id, indexed_by_source.get(source_id)))
         print(f"Scan completed. {len(files_info)} files found.")
         return files_info
     
@@ -53,7 +127,7 @@ class DocumentCatalog:
         """
         with get_scoped_connection(self.connection_string, user_id) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT source_id, file_path, content_hash FROM document_catalog WHERE user_id = %s;",
+                cur.execute("SELECT source_id, file_path, content_hash, file_size, mtime_ns, inode FROM document_catalog WHERE user_id = %s;",
                 (user_id,)
                 )
                 print(f"{cur.rowcount} indexed files retrieved for user {user_id}.")
@@ -62,6 +136,9 @@ class DocumentCatalog:
                         "source_id": row[0],
                         "file_path": row[1],
                         "content_hash": row[2],
+                        "file_size": row[3],
+                        "mtime_ns": row[4],
+                        "inode": row[5],
                     }
                     for row in cur.fetchall()
                 ]
@@ -70,19 +147,24 @@ class DocumentCatalog:
     def add_or_update_file(self, file_info: Dict):
         """
         Adds a new file or updates the metadata of an existing file in the catalog.
-        :param file_info: Dictionary containing file metadata (source_id, file_path, file_type, last_modified, content_hash)
+        :param file_info: Dictionary containing file metadata (source_id, file_path, file_type, last_modified, content_hash,
+            and optionally the stat signature file_size, mtime_ns, inode)
         """
         user_id= file_info["user_id"]
         with get_scoped_connection(self.connection_string, user_id) as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO document_catalog (source_id, user_id, file_path, file_type, last_modified, content_hash)
-                      VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO document_catalog (source_id, user_id, file_path, file_type, last_modified, content_hash, file_size, mtime_ns, inode)
+                      VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (user_id, source_id) DO UPDATE SET
                         content_hash = EXCLUDED.content_hash,
                         last_modified = EXCLUDED.last_modified,
-                        file_type = EXCLUDED.file_type
-                    """, (file_info["source_id"], file_info["user_id"], file_info["file_path"], file_info["file_type"], file_info["last_modified"], file_info["content_hash"]))
+                        file_type = EXCLUDED.file_type,
+                        file_size = EXCLUDED.file_size,
+                        mtime_ns = EXCLUDED.mtime_ns,
+                        inode = EXCLUDED.inode
+                    """, (file_info["source_id"], file_info["user_id"], file_info["file_path"], file_info["file_type"], file_info["last_modified"], file_info["content_hash"],
+                          file_info.get("file_size"), file_info.get("mtime_ns"), file_info.get("inode")))
                 conn.commit()
 
     def delete_file(self, source_id: str, user_id: str):
@@ -0,0 +1,307 @@
+import io
+import json
+import struct
+import sys
+import uuid
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+from psycopg2.extensions import encodings
+from src.db.connection import get_connection, get_scoped_connection
+from src.db.corpus_versions import bump_corpus_version
+from src.db.partitions import ensure_user_partition
+
+# Index access methods whose maintenance can be deferred during very large loads
+DEFERRABLE_INDEX_METHODS = ("bm25", "hnsw", "ivfflat")
+
+
+# Binary COPY framing: signature, flags and header extension length, then the end-of-data marker
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+# Each row: field count, then (length, value) for uuid, collection_id, embedding, document, cmetadata, custom_id
+# and, in the partitioned layouts, user_id
+COPY_COLUMNS = ("uuid", "collection_id", "embedding", "document", "cmetadata", "custom_id")
+
+
+def vector_to_binary(vector: List[float]) -> bytes:
+    """
+    pgvector binary representation of a vector: dimension, unused int16, big-endian float4 values.
+    """
+    values = array("f", vector)
+    if sys.byteorder == "little":
+        values.byteswap()
+    return struct.pack("!hh", len(values), 0) + values.tobytes()
+
+
+def binary_field(value: bytes) -> bytes:
+    return struct.pack("!i", len(value)) + value
+
+
+class ChunkWriter:
+    """
+    Bulk writer of chunk rows into langchain_pg_embedding, one transaction per file.
+
+    Rows are streamed with COPY FROM STDIN (binary format, so vectors are sent as packed
+    float4 instead of being formatted as text) into a temporary staging table, then moved
+    with one INSERT ... SELECT every `flush_rows` rows: COPY FROM is refused on tables
+    with row-level security, the INSERT keeps the RLS policies checked on every row.
+    Nothing is visible to readers until commit(), so a file that fails halfway leaves
+    its previous chunks untouched.
+
+        with ChunkWriter(PSYCOPG2_CONNECTION_STRING, user_id) as writer:
+            writer.write(texts, vectors, metadatas)
+            writer.update_metadata(chunk_hash, metadata)
+            writer.delete_hashes(vanished, source_id)
+    """
+
+    def __init__(self, connection_string: str, user_id: str, collection_name: str = "test_collection",
+                 flush_rows: int = 5000):
+        self.connection_string = connection_string
+        self.user_id = user_id
+        self.collection_name = collection_name
+        self.flush_rows = flush_rows
+        self.conn = None
+        self._scope = None
+        self.collection_id = None
+        self._collection_id_bytes = None
+        self._jsonb = False
+        self._writes_user_id = False
+        self._encoding = "utf_8"
+        self.written = 0
+        self.updated = 0
+        self._staged = 0
+        # (chunk_hash, metadata) of kept chunks whose metadata changed, rewritten at the next flush
+        self._metadata_updates = []
+        self._changed = False
+
+    def __enter__(self):
+        # list-partitioned layout: the user's partition is created (once) before the file's transaction
+        ensure_user_partition(self.connection_string, self.user_id)
+        # pooled checkout: the RLS user setting lives as long as the file's transaction
+        self._scope = get_scoped_connection(self.connection_string, self.user_id)
+        self.conn = self._scope.__enter__()
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT uuid FROM langchain_pg_collection WHERE name = %s;", (self.collection_name,))
+                row = cur.fetchone()
+                if row is None:
+                    raise ValueError(f"Collection not found: {self.collection_name}")
+                self.collection_id = row[0]
+                self._collection_id_bytes = uuid.UUID(str(row[0])).bytes
+                cur.execute("""
+                    SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+                    WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'cmetadata';
+                """)
+                # PGVector stores the metadata as json or jsonb depending on use_jsonb
+                self._jsonb = cur.fetchone()[0] == "jsonb"
+                cur.execute("""
+                    SELECT attgenerated FROM pg_attribute
+                    WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'user_id';
+                """)
+                # user_id is a generated column, except in the partitioned layouts (partition key)
+                row = cur.fetchone()
+                self._writes_user_id = row is not None and row[0] == ""
+                self._encoding = encodings[self.conn.encoding]
+                cur.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS chunk_staging
+                    (LIKE langchain_pg_embedding INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;
+                """)
+        except Exception as e:
+            self._scope.__exit__(type(e), e, e.__traceback__)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.flush()
+                self._bump_version()
+            except Exception as e:
+                exc_type, exc, tb = type(e), e, e.__traceback__
+                self._scope.__exit__(exc_type, exc, tb)
+                raise
+        # the pool commits on a clean exit, rolls back otherwise, and takes the connection back
+        self._scope.__exit__(exc_type, exc, tb)
+        return False
+
+    def write(self, texts: List[str], vectors: List[List[float]], metadatas: List[Dict]) -> int:
+        """
+        Stream chunk rows to the staging table with COPY.
+        :param texts: Contents of the chunks
+        :param vectors: Embeddings of the chunks
+        :param metadatas: Metadata of the chunks
+        :return: Number of rows written
+        """
+        encoding = self._encoding
+        collection_id = binary_field(self._collection_id_bytes)
+        # binary jsonb starts with a format version byte
+        json_prefix = b"\x01" if self._jsonb else b""
+        columns = COPY_COLUMNS + ("user_id",) if self._writes_user_id else COPY_COLUMNS
+        field_count = struct.pack("!h", len(columns))
+        # the staging table copies the NOT NULL of the user_id partition key: it is sent with the rows
+        user_id = binary_field(self.user_id.encode(encoding))
+        buffer = io.BytesIO()
+        buffer.write(COPY_HEADER)
+        for text, vector, metadata in zip(texts, vectors, metadatas):
+            row_id = uuid.uuid4()
+            buffer.write(field_count)
+            buffer.write(binary_field(row_id.bytes))
+            buffer.write(collection_id)
+            buffer.write(binary_field(vector_to_binary(vector)))
+            buffer.write(binary_field(text.encode(encoding)))
+            buffer.write(binary_field(json_prefix + json.dumps(metadata).encode(encoding)))
+            buffer.write(binary_field(str(row_id).encode(encoding)))
+            if self._writes_user_id:
+                buffer.write(user_id)
+        buffer.write(COPY_TRAILER)
+        buffer.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY chunk_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)",
+                buffer
+            )
+        self._staged += len(texts)
+        self.written += len(texts)
+        if self._staged >= self.flush_rows:
+            self.flush()
+        return len(texts)
+
+    def update_metadata(self, chunk_hash: str, metadata: Dict):
+        """
+        Rewrite the metadata of a chunk already stored (moved to another page, sheet...),
+        keeping its row and embedding. Batched: applied at the next flush.
+        :param chunk_hash: The hash of the chunk
+        :param metadata: Its new metadata, with its user_id and source_id
+        """
+        self._metadata_updates.append((chunk_hash, metadata))
+        if len(self._metadata_updates) >= self.flush_rows:
+            self._flush_metadata_updates()
+
+    def _flush_metadata_updates(self):
+        if not self._metadata_updates:
+            return
+        chunk_hashes = [chunk_hash for chunk_hash, _ in self._metadata_updates]
+        source_ids = [metadata["source_id"] for _, metadata in self._metadata_updates]
+        metadatas = [json.dumps(metadata) for _, metadata in self._metadata_updates]
+        with self.conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE langchain_pg_embedding e SET cmetadata = u.cmetadata::{'jsonb' if self._jsonb else 'json'}
+                FROM unnest(%s::text[], %s::text[], %s::text[]) AS u (chunk_hash, source_id, cmetadata)
+                WHERE e.chunk_hash = u.chunk_hash AND e.source_id = u.source_id AND e.user_id = %s
+                """,
+                (chunk_hashes, source_ids, metadatas, self.user_id)
+            )
+            self.updated += cur.rowcount
+            self._changed = self._changed or cur.rowcount > 0
+        self._metadata_updates = []
+
+    def flush(self):
+        """
+        Move the staged rows to langchain_pg_embedding and apply the pending metadata updates
+        (still inside the file's transaction).
+        """
+        self._flush_metadata_updates()
+        if not self._staged:
+            return
+        with self.conn.cursor() as cur:
+            if self._writes_user_id:
+                cur.execute("""
+                    INSERT INTO langchain_pg_embedding (uuid, collection_id, embedding, document, cmetadata, custom_id, user_id)
+                    SELECT uuid, collection_id, embedding, document, cmetadata, custom_id, user_id FROM chunk_staging;
+                """)
+            else:
+                cur.execute("""
+                    INSERT INTO langchain_pg_embedding (uuid, collection_id, embedding, document, cmetadata, custom_id)
+                    SELECT uuid, collection_id, embedding, document, cmetadata, custom_id FROM chunk_staging;
+                """)
+            cur.execute("TRUNCATE chunk_staging;")
+        self._staged = 0
+        self._changed = True
+
+    def _bump_version(self):
+        """
+        Invalidate the user's cached answers with the transaction, if it changed chunks.
+        """
+        if self._changed:
+            with self.conn.cursor() as cur:
+                bump_corpus_version(cur, self.user_id)
+            self._changed = False
+
+    def delete_hashes(self, chunk_hashes: Iterable[str], source_id: str) -> int:
+        """
+        Delete chunks of the file in the same transaction as the writes.
+        :param chunk_hashes: The hashes of the chunks to delete
+        :param source_id: The source file the chunks belong to
+        :return: Number of chunks deleted
+        """
+        chunk_hashes = list(chunk_hashes)
+        if not chunk_hashes:
+            return 0
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM langchain_pg_embedding
+                WHERE chunk_hash = ANY(%s)
+                  AND source_id = %s AND user_id = %s
+                """,
+                (chunk_hashes, source_id, self.user_id)
+            )
+            self._changed = self._changed or cur.rowcount > 0
+            return cur.rowcount
+
+    def commit(self):
+        """
+        Commit the rows written so far, the writer stays usable for the next ones.
+        """
+        self.flush()
+        self._bump_version()
+        self.conn.commit()
+        # the RLS user setting was local to the committed transaction
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT set_config('app.current_user_id', %s, true);", (self.user_id,))
+
+
+@contextmanager
+def deferred_indexes(connection_string: str, methods=DEFERRABLE_INDEX_METHODS):
+    """
+    Drop the BM25/ANN indexes of langchain_pg_embedding for the duration of a very large
+    load and rebuild them once at the end, instead of maintaining them row by row.
+    The indexes are shared by every user: their searches are slower (ANN) or fail (BM25)
+    while the indexes are missing, so this is an offline maintenance tool (benchmarks, bulk
+    imports with the API and the watcher stopped), never called by syncs. Needs the table
+    owner rights.
+    :param connection_string: Postgres connection string
+    :param methods: Index access methods to defer
+    """
+    with get_connection(connection_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT i.relname, pg_get_indexdef(i.oid)
+                FROM pg_index x
+                JOIN pg_class i ON i.oid = x.indexrelid
+                JOIN pg_am am ON am.oid = i.relam
+                WHERE am.amname = ANY(%s)
+                  -- the table and, in the partitioned layouts, its partitions (per-partition BM25 indexes)
+                  AND (x.indrelid = 'langchain_pg_embedding'::regclass OR x.indrelid IN (
+                      SELECT inhrelid FROM pg_inherits WHERE inhparent = 'langchain_pg_embedding'::regclass
+                  ))
+                  -- indexes of partitions inherited from an index of the parent are rebuilt with it
+                  AND NOT EXISTS (SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.oid);
+                """,
+                (list(methods),)
+            )
+            # the definition of a partitioned index is "ON ONLY" the parent: recreate it on the partitions too
+            indexes = [(name, definition.replace(" ON ONLY ", " ON ", 1)) for name, definition in cur.fetchall()]
+            for name, _ in indexes:
+                cur.execute(f'DROP INDEX IF EXISTS "{name}";')
+    print(f"Index différés pendant le chargement : {', '.join(name for name, _ in indexes) or 'aucun'}")
+    try:
+        yield [name for name, _ in indexes]
+    finally:
+        with get_connection(connection_string) as conn:
+            with conn.cursor() as cur:
+                for name, definition in indexes:
+                    print(f"Reconstruction de l'index {name}...")
+                    cur.execute(definition + ";")
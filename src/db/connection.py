@@ -1,12 +1,170 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
 import psycopg2
+from psycopg2 import extensions
+from src.config import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of psycopg2 connections for one connection string.
+
+    Checkouts beyond max_size wait (up to `timeout` seconds) instead of failing, and the
+    pool keeps stats on its size, the waits and how long connections are held.
+    Every checkout runs in its own transaction: it is committed on a clean exit, rolled
+    back on error, and a connection is always returned idle (rolled back if needed).
+    """
+
+    def __init__(self, connection_string: str, min_size: int, max_size: int, timeout: float):
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.timeout = timeout
+        # idle connections, reused last-in first-out. psycopg2's own pools close every
+        # connection above their minimum when it is put back, so they are not used here.
+        self._idle = deque(psycopg2.connect(connection_string) for _ in range(min_size))
+        self._open = min_size
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._checkout_time = 0.0
+        self._max_checkout_time = 0.0
+
+    def _acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError(f"No database connection available after {self.timeout}s")
+            waited = time.monotonic() - start
+            with self._lock:
+                self._waits += 1
+                self._wait_time += waited
+                self._max_wait_time = max(self._max_wait_time, waited)
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                # a slot is held, so opening one more never exceeds max_size
+                self._open += 1
+            self._in_use += 1
+            self._checkouts += 1
+        if conn is None or conn.closed:
+            try:
+                conn = psycopg2.connect(self.connection_string)
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                    self._in_use -= 1
+                self._slots.release()
+                raise
+        return conn
+
+    def _release(self, conn, held: float):
+        broken = bool(conn.closed) or conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN
+        if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        if broken:
+            conn.close()
+        with self._lock:
+            if broken:
+                self._open -= 1
+            else:
+                self._idle.append(conn)
+            self._in_use -= 1
+            self._checkout_time += held
+            self._max_checkout_time = max(self._max_checkout_time, held)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, user_id: Optional[str] = None):
+        """
+        Check out a connection for one transaction.
+        :param user_id: If set, app.current_user_id is set for RLS with SET LOCAL semantics
+            (set_config(..., true)): it only lives until the end of the transaction, so it
+            can never leak to the next user of the connection
+        :return: Context manager yielding the connection
+        """
+        conn = self._acquire()
+        start = time.monotonic()
+        try:
+            if user_id is not None:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT set_config('app.current_user_id', %s, true);", (user_id,))
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self._release(conn, time.monotonic() - start)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total_s": round(self._wait_time, 3),
+                "wait_time_max_s": round(self._max_wait_time, 3),
+                "checkout_time_avg_ms": round(self._checkout_time / self._checkouts * 1000, 2) if self._checkouts else 0.0,
+                "checkout_time_max_ms": round(self._max_checkout_time * 1000, 2),
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(connection_string: str) -> ConnectionPool:
+    """
+    Returns the pool of a connection string, created on first use.
+    """
+    with _pools_lock:
+        pool = _pools.get(connection_string)
+        if pool is None:
+            pool = ConnectionPool(connection_string, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT)
+            _pools[connection_string] = pool
+        return pool
+
 
 def get_scoped_connection(connection_string: str, user_id: str):
     """
-    Opens a Postgres connection and sets the current user for RLS.  
-    Use this wherever a request needs to be filtered/authorized by user, 
+    Checks out a pooled Postgres connection and sets the current user for RLS.
+    Use this wherever a request needs to be filtered/authorized by user,
     including for INSERT statements (RLS also enforces the policy on writes).
+    The transaction is committed when the block exits (rolled back on error); the user
+    setting is local to that transaction, statements run after an explicit commit()
+    inside the block are no longer scoped.
+    """
+    return get_pool(connection_string).connection(user_id)
+
+
+def get_connection(connection_string: str):
+    """
+    Checks out a pooled Postgres connection without user scope (users, shared tables, DDL).
+    """
+    return get_pool(connection_string).connection()
+
+
+def pool_stats() -> Dict:
+    """
+    Returns the stats of every connection pool of the process, by database.
     """
-    conn = psycopg2.connect(connection_string)
-    with conn.cursor() as cur:
-        cur.execute("SET app.current_user_id = %s;", (user_id,))
-    return conn
\ No newline at end of file
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {extensions.parse_dsn(pool.connection_string).get("dbname"): pool.stats() for pool in pools}
@@ -0,0 +1,43 @@
+from src.db.connection import get_connection
+from src.db.async_connection import async_scoped_connection
+
+GET_VERSION_QUERY = "SELECT version FROM corpus_versions WHERE user_id = %s;"
+
+
+def bump_corpus_version(cur, user_id: str):
+    """
+    Increment the corpus version of a user, in the transaction that changes their chunks:
+    the answers cached for the previous version are no longer served once it commits.
+    Call it just before the commit, the row stays locked until then.
+    :param cur: Cursor of the transaction writing or deleting the chunks
+    :param user_id: The user whose chunks changed
+    """
+    cur.execute(
+        """
+        INSERT INTO corpus_versions (user_id, version) VALUES (%s, 1)
+        ON CONFLICT (user_id) DO UPDATE
+        SET version = corpus_versions.version + 1, updated_at = now();
+        """,
+        (user_id,)
+    )
+
+
+def get_corpus_version(connection_string: str, user_id: str) -> int:
+    """
+    Returns the corpus version of a user, 0 if their chunks never changed.
+    """
+    with get_connection(connection_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute(GET_VERSION_QUERY, (user_id,))
+            row = cur.fetchone()
+    return row[0] if row else 0
+
+
+async def aget_corpus_version(connection_string: str, user_id: str) -> int:
+    """
+    Async get_corpus_version, on the psycopg 3 async pool.
+    """
+    async with async_scoped_connection(connection_string) as conn:
+        cur = await conn.execute(GET_VERSION_QUERY, (user_id,))
+        row = await cur.fetchone()
+    return row[0] if row else 0
@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import threading
+from typing import List, Optional
+from psycopg2 import sql
+from src.config import PSYCOPG2_CONNECTION_STRING, CHUNK_PARTITION_METHOD, CHUNK_HASH_PARTITIONS
+from src.db.connection import get_connection
+
+PARTITION_METHODS = ("list", "hash")
+DEFAULT_PARTITION = "langchain_pg_embedding_default"
+# Index access methods created partition by partition instead of once on the parent
+# (pg_search cannot build a BM25 index on a partitioned table)
+PER_PARTITION_INDEX_METHODS = ("bm25",)
+
+# user partitions known to exist (partitioning is one-way, they cannot disappear)
+_known_partitions = set()
+_lock = threading.Lock()
+
+
+def user_partition_name(user_id: str) -> str:
+    """
+    Name of the partition of a user in the list layout (user ids are hashed: any string,
+    always a valid identifier below the 63 characters limit).
+    """
+    return "langchain_pg_embedding_u_" + hashlib.blake2b(user_id.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def get_layout(cur) -> str:
+    """
+    :return: "list" or "hash" when langchain_pg_embedding is partitioned by user_id, otherwise "none"
+    """
+    cur.execute("SELECT partstrat FROM pg_partitioned_table WHERE partrelid = 'langchain_pg_embedding'::regclass;")
+    row = cur.fetchone()
+    return {"l": "list", "h": "hash"}.get(row[0], "none") if row else "none"
+
+
+def _per_partition_indexes(cur, table: str) -> List[tuple]:
+    """
+    (access method, definition after "USING") of the per-partition indexes of a table.
+    """
+    cur.execute(
+        """
+        SELECT am.amname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE x.indrelid = to_regclass(%s) AND am.amname = ANY(%s);
+        """,
+        (table, list(PER_PARTITION_INDEX_METHODS))
+    )
+    return [(method, definition.split(" USING ", 1)[1]) for method, definition in cur.fetchall()]
+
+
+def _create_partition_indexes(cur, partition: str, indexes: List[tuple]):
+    for method, using in indexes:
+        cur.execute(
+            sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING ").format(
+                sql.Identifier(f"{partition}_{method}"), sql.Identifier(partition)
+            ).as_string(cur) + using + ";"
+        )
+
+
+def ensure_user_partition(connection_string: str, user_id: str) -> Optional[str]:
+    """
+    In the list layout, creates the partition of a user on first use, with the per-partition
+    indexes of the default partition; the other indexes are inherited from the parent table.
+    Runs in its own short transaction, before the user's rows are written.
+    The layout is read again until the user's partition is known to exist: a writer that was
+    already running when the table was partitioned must not send new users to the default
+    partition (their partition could not be created afterwards).
+    :return: The partition name, None in the other layouts
+    """
+    name = user_partition_name(user_id)
+    if name in _known_partitions:
+        return name
+    with _lock:
+        with get_connection(connection_string) as conn:
+            with conn.cursor() as cur:
+                if get_layout(cur) != "list":
+                    return None
+                cur.execute("SELECT to_regclass(%s);", (name,))
+                if cur.fetchone()[0] is None:
+                    cur.execute(
+                        sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF langchain_pg_embedding FOR VALUES IN ({});").format(
+                            sql.Identifier(name), sql.Literal(user_id)
+                        )
+                    )
+                    _create_partition_indexes(cur, name, _per_partition_indexes(cur, DEFAULT_PARTITION))
+                    print(f"Partition {name} créée pour l'utilisateur {user_id}")
+        _known_partitions.add(name)
+    return name
+
+
+def truncate_user_partition(cur, user_id: str) -> bool:
+    """
+    Purge the chunks of a user by truncating their partition (list layout), instead of a
+    DELETE of every row followed by the vacuum of the whole table.
+    :param cur: Cursor of the caller's transaction, scoped to the user
+    :return: True if the partition was truncated, False if the caller must DELETE the rows
+    """
+    if get_layout(cur) != "list":
+        return False
+    name = user_partition_name(user_id)
+    cur.execute("SELECT to_regclass(%s);", (name,))
+    if cur.fetchone()[0] is None:
+        return False
+    cur.execute(sql.SQL("TRUNCATE {};").format(sql.Identifier(name)))
+    return True
+
+
+def partition_chunks(connection_string: str = PSYCOPG2_CONNECTION_STRING, method: str = CHUNK_PARTITION_METHOD,
+                     partitions: int = CHUNK_HASH_PARTITIONS) -> bool:
+    """
+    Converts langchain_pg_embedding to a table partitioned by user_id, in one transaction
+    holding an exclusive lock on the table (run it during a maintenance window).
+    user_id becomes a plain column, set by the writers: Postgres cannot partition on a
+    generated column. Rows, foreign keys, indexes, RLS policies and grants are carried over;
+    BM25 indexes are built on each partition, the other indexes on the parent.
+    Queries filtering on user_id only scan the user's partition, and so does its ANN index.
+    :param connection_string: Postgres connection string (the role must own the table)
+    :param method: "list" (one partition per user, plus a default one) or "hash"
+    :param partitions: Number of partitions of the hash layout
+    :return: False if the table was already partitioned
+    """
+    if method not in PARTITION_METHODS:
+        raise ValueError(f"Unknown partition method: {method} (expected one of {PARTITION_METHODS})")
+    with get_connection(connection_string) as conn:
+        with conn.cursor() as cur:
+            if get_layout(cur) != "none":
+                return False
+            cur.execute("LOCK TABLE langchain_pg_embedding IN ACCESS EXCLUSIVE MODE;")
+
+            # everything that has to be carried over to the new table
+            cur.execute("""
+                SELECT a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull, a.attgenerated,
+                       pg_get_expr(d.adbin, d.adrelid)
+                FROM pg_attribute a
+                LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                WHERE a.attrelid = 'langchain_pg_embedding'::regclass AND a.attnum > 0 AND NOT a.attisdropped
+                ORDER BY a.attnum;
+            """)
+            columns = cur.fetchall()
+            cur.execute("""
+                SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+                WHERE conrelid = 'langchain_pg_embedding'::regclass AND contype = 'f';
+            """)
+            foreign_keys = cur.fetchall()
+            cur.execute("""
+                SELECT am.amname, pg_get_indexdef(i.oid)
+                FROM pg_index x
+                JOIN pg_class i ON i.oid = x.indexrelid
+                JOIN pg_am am ON am.oid = i.relam
+                WHERE x.indrelid = 'langchain_pg_embedding'::regclass AND NOT x.indisprimary;
+            """)
+            indexes = cur.fetchall()
+            cur.execute("""
+                SELECT policyname, permissive, roles, cmd, qual, with_check FROM pg_policies
+                WHERE schemaname = current_schema() AND tablename = 'langchain_pg_embedding';
+            """)
+            policies = cur.fetchall()
+            cur.execute("""
+                SELECT c.relrowsecurity, c.relforcerowsecurity,
+                       ARRAY(SELECT DISTINCT format('GRANT %s ON langchain_pg_embedding TO %s;', a.privilege_type,
+                                                    CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(a.grantee)) END)
+                             FROM aclexplode(c.relacl) a WHERE a.grantee <> c.relowner)
+                FROM pg_class c WHERE c.oid = 'langchain_pg_embedding'::regclass;
+            """)
+            row_security, force_row_security, grants = cur.fetchone()
+
+            definitions, copied = [], []
+            for name, type_name, not_null, generated, expression in columns:
+                column = sql.SQL("{} ").format(sql.Identifier(name)).as_string(cur) + type_name
+                if name == "user_id":
+                    column += " NOT NULL"
+                elif generated == "s":
+                    column += f" GENERATED ALWAYS AS ({expression}) STORED"
+                else:
+                    if expression:
+                        column += f" DEFAULT {expression}"
+                    if not_null:
+                        column += " NOT NULL"
+                if name == "user_id" or generated != "s":
+                    copied.append(name)
+                definitions.append(column)
+            column_list = sql.SQL(", ").join(map(sql.Identifier, copied)).as_string(cur)
+            cur.execute(
+                f"""
+                CREATE TABLE langchain_pg_embedding_partitioned ({", ".join(definitions)}, PRIMARY KEY (uuid, user_id))
+                PARTITION BY {method.upper()} (user_id);
+                """
+            )
+
+            if method == "list":
+                cur.execute("SELECT DISTINCT user_id FROM langchain_pg_embedding WHERE user_id IS NOT NULL;")
+                targets = [(user_partition_name(user_id), sql.SQL("FOR VALUES IN ({})").format(sql.Literal(user_id)))
+                           for (user_id,) in cur.fetchall()]
+                targets.append((DEFAULT_PARTITION, sql.SQL("DEFAULT")))
+            else:
+                targets = [(f"langchain_pg_embedding_p{i}", sql.SQL("FOR VALUES WITH (MODULUS {}, REMAINDER {})").format(
+                    sql.Literal(partitions), sql.Literal(i))) for i in range(partitions)]
+            for name, bounds in targets:
+                cur.execute(sql.SQL("CREATE TABLE {} PARTITION OF langchain_pg_embedding_partitioned {};").format(
+                    sql.Identifier(name), bounds))
+
+            print("Copie des chunks vers la table partitionnée...")
+            cur.execute(
+                f"""
+                INSERT INTO langchain_pg_embedding_partitioned ({column_list})
+                SELECT {column_list.replace('"user_id"', "COALESCE(user_id, '')")} FROM langchain_pg_embedding;
+                """
+            )
+            print(f"{cur.rowcount} chunks copiés dans {len(targets)} partitions")
+
+            cur.execute("DROP TABLE langchain_pg_embedding;")
+            cur.execute("ALTER TABLE langchain_pg_embedding_partitioned RENAME TO langchain_pg_embedding;")
+            cur.execute("ALTER TABLE langchain_pg_embedding RENAME CONSTRAINT langchain_pg_embedding_partitioned_pkey TO langchain_pg_embedding_pkey;")
+            for name, definition in foreign_keys:
+                cur.execute(sql.SQL("ALTER TABLE langchain_pg_embedding ADD CONSTRAINT {} ").format(
+                    sql.Identifier(name)).as_string(cur) + definition + ";")
+            for method_name, definition in indexes:
+                if method_name in PER_PARTITION_INDEX_METHODS:
+                    for name, _ in targets:
+                        _create_partition_indexes(cur, name, [(method_name, definition.split(" USING ", 1)[1])])
+                else:
+                    print(f"Construction de l'index : {definition}")
+                    cur.execute(definition + ";")
+
+            if row_security:
+                cur.execute("ALTER TABLE langchain_pg_embedding ENABLE ROW LEVEL SECURITY;")
+            if force_row_security:
+                cur.execute("ALTER TABLE langchain_pg_embedding FORCE ROW LEVEL SECURITY;")
+            for name, permissive, roles, command, qual, with_check in policies:
+                statement = sql.SQL("CREATE POLICY {} ON langchain_pg_embedding AS {} FOR {} TO {}").format(
+                    sql.Identifier(name), sql.SQL(permissive), sql.SQL(command),
+                    sql.SQL(", ").join(sql.SQL("PUBLIC") if role == "public" else sql.Identifier(role) for role in roles)
+                ).as_string(cur)
+                if qual:
+                    statement += f" USING ({qual})"
+                if with_check:
+                    statement += f" WITH CHECK ({with_check})"
+                cur.execute(statement + ";")
+            for grant in grants:
+                cur.execute(grant)
+            cur.execute("ANALYZE langchain_pg_embedding;")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition the chunk table by user_id")
+    parser.add_argument("action", choices=["status", "enable"])
+    parser.add_argument("--method", default=CHUNK_PARTITION_METHOD, choices=PARTITION_METHODS)
+    parser.add_argument("--partitions", type=int, default=CHUNK_HASH_PARTITIONS, help="Number of partitions (hash layout)")
+    args = parser.parse_args()
+
+    if args.action == "enable" and not partition_chunks(method=args.method, partitions=args.partitions):
+        print("langchain_pg_embedding est déjà partitionnée")
+    with get_connection(PSYCOPG2_CONNECTION_STRING) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*), pg_size_pretty(sum(pg_total_relation_size(c.oid)))
+                FROM pg_class c
+                WHERE c.oid = 'langchain_pg_embedding'::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'langchain_pg_embedding'::regclass);
+            """)
+            count, size = cur.fetchone()
+            print(f"Layout : {get_layout(cur)}, {count} table(s) (parent included), {size}")
+
+
+if __name__ == "__main__":
+    main()
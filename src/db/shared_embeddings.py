@@ -0,0 +1,67 @@
+from psycopg2.extras import execute_values
+from typing import Dict, Iterable, List, Tuple
+from src.db.connection import get_connection
+
+
+class SharedEmbeddings:
+    """
+    Tenant-agnostic store of embeddings keyed only by (model, chunk_hash).
+
+    It holds no text, no user_id and no source: a vector can only be looked up by the
+    hash of the exact chunk content, which the caller must already have. The per-user
+    rows of langchain_pg_embedding keep their own copy of the vector, so RLS on the
+    user-visible rows is unchanged; this table only avoids a second embedding call when
+    two users upload identical content (e.g. the same syllabus PDF).
+    """
+
+    def __init__(self, connection_string: str):
+        self.connection_string = connection_string
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, chunk_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Look up the shared vectors of several chunks.
+        :param model: Name of the embedding model
+        :param chunk_hashes: Hashes of the chunks to look up
+        :return: Dict chunk_hash -> vector, only for the hashes found
+        """
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        if not chunk_hashes:
+            return {}
+        with get_connection(self.connection_string) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT chunk_hash, embedding::real[]
+                    FROM shared_chunk_embeddings
+                    WHERE model = %s AND chunk_hash = ANY(%s);
+                    """,
+                    (model, chunk_hashes)
+                )
+                found = {chunk_hash: list(vector) for chunk_hash, vector in cur.fetchall()}
+        self.hits += len(found)
+        self.misses += len(chunk_hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """
+        Share newly computed vectors. Existing entries are kept as they are.
+        :param model: Name of the embedding model
+        :param items: Iterable of (chunk_hash, vector)
+        """
+        rows = [(model, chunk_hash, [float(x) for x in vector]) for chunk_hash, vector in items]
+        if not rows:
+            return
+        with get_connection(self.connection_string) as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO shared_chunk_embeddings (model, chunk_hash, embedding)
+                    VALUES %s
+                    ON CONFLICT (model, chunk_hash) DO NOTHING;
+                    """,
+                    rows,
+                    template="(%s, %s, %s::real[]::vector)"
+                )
@@ -1,6 +1,6 @@
-import psycopg2
 import bcrypt
 from typing import List, Dict, Optional
+from src.db.connection import get_connection
 
 
 class Users:
@@ -12,7 +12,7 @@ class Users:
         Creates a new user with the given email, password, and admin status.
         """
         password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-        with psycopg2.connect(self.connection_string) as conn:
+        with get_connection(self.connection_string) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -29,7 +29,7 @@ class Users:
         """
         Retrieves a user by their email address.
         """
-        with psycopg2.connect(self.connection_string) as conn:
+        with get_connection(self.connection_string) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT id, email, password_hash, is_admin FROM users WHERE email = %s;",
@@ -61,7 +61,7 @@ class Users:
         """
         Reserved for admins — lists all users without exposing the hashes.
         """
-        with psycopg2.connect(self.connection_string) as conn:
+        with get_connection(self.connection_string) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT id, email, is_admin, created_at FROM users ORDER BY created_at DESC;"
@@ -75,7 +75,7 @@ class Users:
         """
         Deletes a user by their ID. Reserved for admins.
         """
-        with psycopg2.connect(self.connection_string) as conn:
+        with get_connection(self.connection_string) as conn:
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM users WHERE id = %s;", (user_id,))
                 conn.commit()
\ No newline at end of file
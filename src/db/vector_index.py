@@ -0,0 +1,140 @@
+import argparse
+from typing import Dict, Optional
+from src.config import (
+    PSYCOPG2_CONNECTION_STRING, EMBEDDING_DIMENSIONS, VECTOR_INDEX_METHOD, HNSW_M,
+    HNSW_EF_CONSTRUCTION, IVFFLAT_LISTS, VECTOR_INDEX_MAINTENANCE_WORK_MEM
+)
+from src.db.connection import get_connection
+
+VECTOR_INDEX_NAME = "ix_langchain_pg_embedding_embedding_ann"
+VECTOR_INDEX_METHODS = ("hnsw", "ivfflat")
+
+
+def embedding_expression(dimensions: int = EMBEDDING_DIMENSIONS) -> str:
+    """
+    Indexed expression. PGVector creates the embedding column without a dimension, which
+    pgvector cannot index: the index is built on a typed cast, and queries must use the
+    exact same expression to be able to use it.
+    """
+    return f"(embedding::vector({int(dimensions)}))"
+
+
+def index_definition(method: str = VECTOR_INDEX_METHOD, dimensions: int = EMBEDDING_DIMENSIONS,
+                     m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                     lists: int = IVFFLAT_LISTS) -> str:
+    """
+    CREATE INDEX statement of the ANN index (cosine distance, the PGVector default).
+    :param method: "hnsw" or "ivfflat"
+    :param dimensions: Dimension of the embeddings
+    :param m: HNSW: max connections per node (recall and size grow with it)
+    :param ef_construction: HNSW: candidate list size while building (recall and build time grow with it)
+    :param lists: IVFFlat: number of clusters, usually rows / 1000 (sqrt(rows) above 1M rows)
+    :return: SQL statement
+    """
+    if method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        options = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"Unknown vector index method: {method} (expected one of {VECTOR_INDEX_METHODS})")
+    return (
+        f'CREATE INDEX "{VECTOR_INDEX_NAME}" ON langchain_pg_embedding '
+        f"USING {method} ({embedding_expression(dimensions)} vector_cosine_ops) WITH ({options})"
+    )
+
+
+def get_vector_index(connection_string: str = PSYCOPG2_CONNECTION_STRING) -> Optional[Dict]:
+    """
+    Returns the current ANN index (name, method, definition, size) or None.
+    """
+    with get_connection(connection_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT i.relname, am.amname, pg_get_indexdef(i.oid),
+                       -- a partitioned index has no storage of its own, count the indexes of its partitions
+                       pg_size_pretty(COALESCE(
+                           (SELECT sum(pg_relation_size(relid)) FROM pg_partition_tree(i.oid)), pg_relation_size(i.oid)
+                       ))
+                FROM pg_index x
+                JOIN pg_class i ON i.oid = x.indexrelid
+                JOIN pg_am am ON am.oid = i.relam
+                WHERE x.indrelid = 'langchain_pg_embedding'::regclass AND am.amname = ANY(%s);
+                """,
+                (list(VECTOR_INDEX_METHODS),)
+            )
+            row = cur.fetchone()
+    if row is None:
+        return None
+    return {"name": row[0], "method": row[1], "definition": row[2], "size": row[3]}
+
+
+def drop_vector_index(connection_string: str = PSYCOPG2_CONNECTION_STRING) -> bool:
+    """
+    Drops the ANN index. Similarity search falls back to exact scans.
+    :return: True if an index was dropped
+    """
+    existing = get_vector_index(connection_string)
+    if existing is None:
+        return False
+    with get_connection(connection_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP INDEX IF EXISTS "{existing["name"]}";')
+    print(f"Index vectoriel {existing['name']} supprimé")
+    return True
+
+
+def ensure_vector_index(connection_string: str = PSYCOPG2_CONNECTION_STRING, method: str = VECTOR_INDEX_METHOD,
+                        rebuild: bool = False, **params) -> bool:
+    """
+    Creates the ANN index on the chunk embeddings if there is none.
+    The build locks writes on langchain_pg_embedding and can take minutes on a large table;
+    an IVFFlat index should be built once the table is loaded (its clusters are computed
+    from the rows present at build time).
+    :param connection_string: Postgres connection string (the role must own the table)
+    :param method: "hnsw", "ivfflat" or "none" (nothing is created)
+    :param rebuild: Drop and recreate an existing index, e.g. to apply new build parameters
+    :param params: Build parameters of index_definition (dimensions, m, ef_construction, lists)
+    :return: True if an index was built
+    """
+    if method == "none":
+        return False
+    existing = get_vector_index(connection_string)
+    if existing is not None and not rebuild:
+        return False
+    statement = index_definition(method, **params)
+    with get_connection(connection_string) as conn:
+        with conn.cursor() as cur:
+            if existing is not None:
+                cur.execute(f'DROP INDEX IF EXISTS "{existing["name"]}";')
+            # more memory keeps the HNSW graph in memory while it is built (much faster)
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, true);", (VECTOR_INDEX_MAINTENANCE_WORK_MEM,))
+            print(f"Construction de l'index vectoriel : {statement}")
+            cur.execute(statement + ";")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the ANN index of the chunk embeddings")
+    parser.add_argument("action", choices=["status", "create", "rebuild", "drop"])
+    parser.add_argument("--method", default=VECTOR_INDEX_METHOD, choices=VECTOR_INDEX_METHODS)
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS)
+    parser.add_argument("--m", type=int, default=HNSW_M, help="HNSW max connections per node")
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION, help="HNSW build candidate list size")
+    parser.add_argument("--lists", type=int, default=IVFFLAT_LISTS, help="IVFFlat number of clusters")
+    args = parser.parse_args()
+
+    if args.action == "drop":
+        drop_vector_index()
+    elif args.action in ("create", "rebuild"):
+        built = ensure_vector_index(
+            method=args.method, rebuild=args.action == "rebuild", dimensions=args.dimensions,
+            m=args.m, ef_construction=args.ef_construction, lists=args.lists
+        )
+        if not built:
+            print("Index vectoriel déjà présent (utiliser rebuild pour le reconstruire)")
+    print(get_vector_index() or "Aucun index vectoriel")
+
+
+if __name__ == "__main__":
+    main()
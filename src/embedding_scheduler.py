@@ -0,0 +1,225 @@
+import asyncio
+import random
+import threading
+import time
+from typing import List
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate for an embedding input (about 3 characters per token
+    for French/English text), used to keep requests under the provider's limits.
+    :param text: Text to estimate
+    :return: Estimated number of tokens
+    """
+    return len(text) // 3 + 1
+
+
+def iter_error_chain(exc: BaseException):
+    """
+    The exception and the ones it wraps: tenacity RetryError and chained causes.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        last_attempt = getattr(exc, "last_attempt", None)
+        if last_attempt is not None and last_attempt.failed:
+            exc = last_attempt.exception()
+        else:
+            exc = exc.__cause__ or exc.__context__
+
+
+def error_status_code(exc: BaseException):
+    """
+    HTTP status of an error: the status_code of the exception (Mistral SDK errors) or of its
+    response (httpx.HTTPStatusError), None if it has none.
+    """
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    True if the exception (or one it wraps) is an HTTP 429 from the provider, judged on the
+    status code only.
+    """
+    return any(error_status_code(e) == 429 for e in iter_error_chain(exc))
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    True if the exception (or one it wraps) is a timeout or a 5xx from the provider, which
+    the provider's client used to retry itself.
+    """
+    return any(
+        isinstance(e, httpx.TimeoutException) or (error_status_code(e) or 0) >= 500
+        for e in iter_error_chain(exc)
+    )
+
+
+class TokenBucket:
+    """
+    Continuous token bucket holding at most `rate_per_minute` tokens.
+    The rate can be lowered on 429s and raised back as requests succeed.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.max_rate = rate_per_minute
+        self.rate = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_rate, self.tokens + (now - self.updated) * self.rate / 60)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """
+        Wait until `amount` tokens are available and take them.
+        Requests bigger than the bucket only wait for a full bucket.
+        """
+        amount = min(amount, self.max_rate)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) * 60 / self.rate)
+
+    def slow_down(self):
+        self.rate = max(self.max_rate * 0.05, self.rate / 2)
+
+    def speed_up(self):
+        self.rate = min(self.max_rate, self.rate * 1.05)
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper scheduling calls to the provider under its requests/tokens per minute
+    quotas: inputs are split into batches, sent concurrently (at most max_in_flight requests),
+    throttled by two token buckets and retried with adaptive backoff on 429s. Timeouts and
+    5xx responses are retried a few times with a short backoff (the wrapped client must not
+    retry by itself, see src/config.py).
+
+    All calls run on one background event loop, so the limits are shared between sync callers
+    (ingestion, PGVector search) and async callers (FastAPI endpoints).
+    """
+
+    def __init__(self, embeddings: Embeddings, requests_per_minute: int, tokens_per_minute: int,
+                 max_in_flight: int, batch_size: int, max_tokens_per_batch: int, max_retries: int = 6,
+                 max_transient_retries: int = 3):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.max_transient_retries = max_transient_retries
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rate_limited_count = 0
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return self.embeddings.model
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Start the background event loop (and the limiters bound to it) on first use.
+        """
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="embedding-scheduler", daemon=True).start()
+                self._request_bucket = TokenBucket(self.requests_per_minute)
+                self._token_bucket = TokenBucket(self.tokens_per_minute)
+                self._in_flight = asyncio.Semaphore(self.max_in_flight)
+                self._loop = loop
+            return self._loop
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_tokens_per_batch):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _send(self, call, tokens: int):
+        """
+        Run one provider request under the limiters, retrying on 429 with exponential backoff
+        (and slower limiters), and on timeouts and 5xx with a bounded backoff.
+        """
+        rate_limited = 0
+        transient = 0
+        while True:
+            await self._request_bucket.acquire(1)
+            await self._token_bucket.acquire(tokens)
+            async with self._in_flight:
+                try:
+                    result = await call()
+                except Exception as e:
+                    if is_rate_limit_error(e) and rate_limited < self.max_retries:
+                        self.rate_limited_count += 1
+                        self._request_bucket.slow_down()
+                        self._token_bucket.slow_down()
+                        delay = min(60, 2 ** rate_limited) * (0.5 + random.random())
+                        rate_limited += 1
+                        print(f"Embedding rate limited (429), retry in {delay:.1f}s")
+                    elif is_transient_error(e) and transient < self.max_transient_retries:
+                        delay = min(8, 2 ** transient) * (0.5 + random.random())
+                        transient += 1
+                        print(f"Embedding request failed ({type(e).__name__}), retry in {delay:.1f}s")
+                    else:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+            self._request_bucket.speed_up()
+            self._token_bucket.speed_up()
+            return result
+
+    async def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = self._batches(texts)
+        results = await asyncio.gather(*[
+            self._send(lambda batch=batch: self.embeddings.aembed_documents(batch),
+                       sum(estimate_tokens(text) for text in batch))
+            for batch in batches
+        ])
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def _embed_query(self, text: str) -> List[float]:
+        return await self._send(lambda: self.embeddings.aembed_query(text), estimate_tokens(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return asyncio.run_coroutine_threadsafe(self._embed_documents(texts), self._get_loop()).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return asyncio.run_coroutine_threadsafe(self._embed_query(text), self._get_loop()).result()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._embed_documents(texts), self._get_loop())
+        return await asyncio.wrap_future(future)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        future = asyncio.run_coroutine_threadsafe(self._embed_query(text), self._get_loop())
+        return await asyncio.wrap_future(future)
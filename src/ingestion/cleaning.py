@@ -0,0 +1,75 @@
+import re
+from typing import List
+
+# Characters deleted: NUL and zero-width characters
+_DELETED = re.compile("[\x00\u200b\u200c\u200d\ufeff]")
+# Any character the fast path cannot handle: deleted characters, tabs and the ASCII
+# control characters (except \n and \r) that become spaces
+_SPECIAL = re.compile("[\x00-\x09\x0b\x0c\x0e-\x1f\x7f\u200b\u200c\u200d\ufeff]")
+# Runs of spaces, tabs and control characters, collapsed to a single space in one pass.
+# Single spaces are not matched, so they are not rewritten.
+_BLANKS = re.compile("[\t\x01-\x08\x0b\x0c\x0e-\x1f\x7f][ \t\x01-\x08\x0b\x0c\x0e-\x1f\x7f]*| [ \t\x01-\x08\x0b\x0c\x0e-\x1f\x7f]+")
+_MULTIPLE_SPACES = re.compile(r" {2,}")
+# Backslashes that are not already escaped
+_UNESCAPED_BACKSLASH = re.compile(r'\\(?!["\\/bfnrtu])')
+_MULTIPLE_NEWLINES = re.compile(r"\n{3,}")
+
+
+def clean_text(text):
+    """
+    Removes problematic characters and normalizes the text.
+    - Null characters
+    - Invisible characters (Zero-Width)
+    - Multiple spaces
+    :param text: Text to clean
+    :return: Cleaned text
+    """
+    if not text:
+        return text
+    if _SPECIAL.search(text):
+        text = _DELETED.sub("", text)
+        if "\\" in text:
+            text = _UNESCAPED_BACKSLASH.sub(r"\\\\", text)
+        text = _BLANKS.sub(" ", text)
+    else:
+        if "\\" in text:
+            text = _UNESCAPED_BACKSLASH.sub(r"\\\\", text)
+        if "  " in text:
+            text = _MULTIPLE_SPACES.sub(" ", text)
+    if "\n\n\n" in text:
+        text = _MULTIPLE_NEWLINES.sub("\n\n", text)
+    return text.strip()
+
+
+def clean_texts(texts: List[str]) -> List[str]:
+    """
+    Cleans several texts at once, same output as clean_text on each of them.
+    :param texts: Texts to clean
+    :return: Cleaned texts, in the same order
+    """
+    return [clean_text(text) for text in texts]
+
+
+def clean_documents(docs):
+    """
+    Cleans all documents by removing NUL characters from content and metadata.
+    Contents and string metadata values of the whole list are cleaned in one batch.
+    :param docs: List of documents to clean
+    :return: List of cleaned documents
+    """
+    texts = []
+    targets = []
+    for d in docs:
+        texts.append(d.page_content)
+        targets.append((d, None))
+        for key, value in d.metadata.items():
+            if isinstance(value, str):
+                texts.append(value)
+                targets.append((d, key))
+
+    for (d, key), text in zip(targets, clean_texts(texts)):
+        if key is None:
+            d.page_content = text
+        else:
+            d.metadata[key] = text
+    return docs
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+# Seconds a connection waits for the write lock of another process (API, watcher, CLI sync)
+# before failing with "database is locked"
+BUSY_TIMEOUT = 30
+
+
+class EmbeddingCache:
+    """
+    Local content-addressed cache of embeddings, keyed by (model name, chunk_hash).
+    Vectors are stored as float32 blobs in a SQLite file and evicted in LRU order
+    once the total size exceeds max_bytes, so they survive chunk deletions
+    (clear-collection, renames, re-sync) and are never embedded twice.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        with self._conn:
+            # readers never block the writer; writers queue on the busy timeout
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, chunk_hash)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access_idx ON embeddings (last_access)")
+
+    def get_many(self, model: str, chunk_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Look up the cached vectors of several chunks and refresh their LRU position.
+        :param model: Name of the embedding model
+        :param chunk_hashes: Hashes of the chunks to look up
+        :return: Dict chunk_hash -> vector, only for the hashes found
+        """
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(chunk_hashes), 500):
+                batch = chunk_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    (model, *batch)
+                ).fetchall()
+                for chunk_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[chunk_hash] = vector.tolist()
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND chunk_hash = ?",
+                        [(now, model, chunk_hash) for chunk_hash in found]
+                    )
+            self.hits += len(found)
+            self.misses += len(chunk_hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """
+        Store several vectors, then evict the least recently used ones if the cache is too big.
+        :param model: Name of the embedding model
+        :param items: Iterable of (chunk_hash, vector)
+        """
+        now = time.time()
+        rows = []
+        for chunk_hash, vector in items:
+            blob = array("f", vector).tobytes()
+            rows.append((model, chunk_hash, blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, chunk_hash, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._evict()
+
+    def _evict(self):
+        """
+        Delete the least recently used entries until the cache is back to 90% of max_bytes.
+        Must be called with the lock held, inside a transaction.
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = []
+        for model, chunk_hash, size in self._conn.execute(
+            "SELECT model, chunk_hash, size FROM embeddings ORDER BY last_access"
+        ).fetchall():
+            if total - freed <= target:
+                break
+            evicted.append((model, chunk_hash))
+            freed += size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND chunk_hash = ?", evicted)
+
+    def stats(self) -> Dict:
+        """
+        Returns the hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
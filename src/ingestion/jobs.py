@@ -0,0 +1,140 @@
+import copy
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from src.ingestion import sync
+
+
+class SyncJobManager:
+    """
+    Runs sync_collection as background jobs in a pool of worker threads, so the API
+    returns a job id immediately instead of blocking until ingestion finishes.
+    Jobs are kept in memory with their per-file progress, counts and errors.
+    Two syncs of the same directory for the same user never run at once: a request
+    made while one is running queues a single follow-up job (started when the running
+    one finishes, so files uploaded meanwhile are picked up), and further requests
+    return that queued job.
+    """
+
+    def __init__(self, max_workers: int, retention_seconds: int = 3600):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync-job")
+        self._jobs: Dict[str, Dict] = {}
+        self._running: Dict[Tuple[str, str], str] = {}
+        self._queued: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, directory: str, user_id: str) -> Dict:
+        """
+        Enqueue a sync of a directory for a user, or return the job already syncing it.
+        :param directory: The directory to synchronize
+        :param user_id: the user this sync belongs to
+        :return: Snapshot of the job
+        """
+        key = (user_id, os.path.normpath(directory))
+        with self._lock:
+            self._prune()
+            job_id = self._queued.get(key)
+            if job_id is not None:
+                return copy.deepcopy(self._jobs[job_id])
+
+            job_id = str(uuid.uuid4())
+            self._jobs[job_id] = {
+                "id": job_id,
+                "user_id": user_id,
+                "directory": directory,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "files_total": 0,
+                "files_done": 0,
+                "files": {},
+                "counts": {"added": 0, "reused": 0, "removed": 0, "deleted_files": 0, "failed_files": 0},
+                "errors": [],
+            }
+            snapshot = copy.deepcopy(self._jobs[job_id])
+            if key in self._running:
+                self._queued[key] = job_id
+                return snapshot
+            self._running[key] = job_id
+
+        self._executor.submit(self._run, job_id, key)
+        return snapshot
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Returns a snapshot of a job, or None if it does not exist (or belongs to another user).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (user_id is not None and job["user_id"] != user_id):
+                return None
+            return copy.deepcopy(job)
+
+    def _run(self, job_id: str, key: Tuple[str, str]):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+        # a file that fails is listed in the errors of a completed job, "failed" means the sync itself crashed
+        status = "completed"
+        try:
+            sync.sync_collection(job["directory"], job["user_id"], progress=lambda update: self._on_progress(job_id, update))
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                job["errors"].append({"source_id": None, "error": str(e)})
+            status = "failed"
+        with self._lock:
+            job["status"] = status
+            job["finished_at"] = time.time()
+            self._running.pop(key, None)
+            next_job_id = self._queued.pop(key, None)
+            if next_job_id is not None:
+                self._running[key] = next_job_id
+        if next_job_id is not None:
+            self._executor.submit(self._run, next_job_id, key)
+
+    def _on_progress(self, job_id: str, update: Dict):
+        with self._lock:
+            job = self._jobs[job_id]
+            event = update["event"]
+            if event == "planned":
+                job["files_total"] = len(update["to_add"]) + len(update["to_delete"])
+                for source_id in update["to_delete"]:
+                    job["files"][source_id] = {"status": "pending", "action": "delete"}
+                for source_id in update["to_add"]:
+                    job["files"][source_id] = {"status": "pending", "action": "index"}
+                return
+
+            file = job["files"].setdefault(update["source_id"], {})
+            job["files_done"] += 1
+            if event == "file_deleted":
+                file["status"] = "deleted"
+                job["counts"]["deleted_files"] += 1
+            elif event == "file_indexed":
+                file["status"] = "indexed"
+                file.update(update["report"])
+                for name, value in update["report"].items():
+                    job["counts"][name] += value
+            elif event == "file_failed":
+                file["status"] = "failed"
+                file["error"] = update["error"]
+                job["counts"]["failed_files"] += 1
+                job["errors"].append({"source_id": update["source_id"], "error": update["error"]})
+
+    def _prune(self):
+        """
+        Forget finished jobs older than retention_seconds. Must be called with the lock held.
+        """
+        limit = time.time() - self.retention_seconds
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < limit
+        ]:
+            del self._jobs[job_id]
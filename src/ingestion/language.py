@@ -0,0 +1,128 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+from lingua import Language, LanguageDetectorBuilder
+from src.config import LANGUAGE_SAMPLE_CHARS, LANGUAGE_HOMOGENEOUS_MIN_DOCS, LANGUAGE_CACHE_SIZE
+
+# Initialize the language detector once
+detector = LanguageDetectorBuilder.from_languages(Language.FRENCH, Language.ENGLISH).build()
+
+# Texts shorter than this (once stripped) are not detected
+MIN_DETECTION_CHARS = 10
+
+# sample hash -> ISO code, shared by every file parsed in this process (and its threads)
+_language_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_language_cache_lock = threading.Lock()
+
+
+def _to_code(lang: Optional[Language]) -> str:
+    return lang.iso_code_639_1.name.lower() if lang else "unknown"
+
+
+def sample_text(text: str, sample_chars: int = LANGUAGE_SAMPLE_CHARS) -> str:
+    """
+    Bounded prefix of a text used for detection, cut on a whitespace when possible
+    so the last word is not truncated.
+    :param text: Text to sample
+    :param sample_chars: Maximum number of characters kept
+    :return: Sample of the text
+    """
+    text = text.strip()
+    if len(text) <= sample_chars:
+        return text
+    cut = text.rfind(" ", 0, sample_chars)
+    return text[:cut if cut > sample_chars // 2 else sample_chars]
+
+
+def detect_language(text):
+    """
+    Detects the language of a text (on a bounded prefix of it).
+    :param text: Text to analyze
+    :return: ISO code of the language (e.g., 'fr', 'en') or 'unknown' if not detectable
+    """
+    return detect_languages([text])[0]
+
+
+def detect_languages(texts: List[str]) -> List[str]:
+    """
+    Detects the language of several texts: each text is reduced to a bounded sample,
+    samples already seen are answered from the cache and the others are detected with
+    lingua's multi-threaded batch API.
+    :param texts: Texts to analyze
+    :return: ISO codes, in the order of the texts ('unknown' if not detectable)
+    """
+    codes = ["unknown"] * len(texts)
+    pending = {}
+    for i, text in enumerate(texts):
+        if not text or len(text.strip()) < MIN_DETECTION_CHARS:  # Besoin d'au moins 10 caractères
+            continue
+        sample = sample_text(text)
+        key = hashlib.blake2b(sample.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with _language_cache_lock:
+            code = _language_cache.get(key)
+            if code is not None:
+                _language_cache.move_to_end(key)
+        if code is not None:
+            codes[i] = code
+        else:
+            pending.setdefault(key, (sample, []))[1].append(i)
+
+    if pending:
+        keys = list(pending)
+        try:
+            detected = detector.detect_languages_in_parallel_of([pending[key][0] for key in keys])
+        except Exception as e:
+            print(f"Erreur lors de la détection de langue: {e}")
+            return codes
+        with _language_cache_lock:
+            for key, lang in zip(keys, detected):
+                code = _to_code(lang)
+                for i in pending[key][1]:
+                    codes[i] = code
+                _language_cache[key] = code
+            while len(_language_cache) > LANGUAGE_CACHE_SIZE:
+                _language_cache.popitem(last=False)
+    return codes
+
+
+class FileLanguageDetector:
+    """
+    Language detection stage for the documents (pages, rows...) of one file, fed batch by batch.
+
+    The first batch is detected document by document. If it has at least `min_docs`
+    detectable documents and they all agree, the file is considered homogeneous: the next
+    batches get that language after a spot check of a few documents spread across the batch.
+    As soon as one of them disagrees, the detector goes back to per-document detection
+    for the rest of the file.
+    """
+
+    def __init__(self, min_docs: int = LANGUAGE_HOMOGENEOUS_MIN_DOCS):
+        self.min_docs = min_docs
+        self.language = None
+        self._first_batch = True
+
+    def detect_batch(self, texts: List[str]) -> List[str]:
+        """
+        :param texts: Contents of the next documents of the file
+        :return: ISO codes, in the order of the texts
+        """
+        if self.language is None:
+            codes = detect_languages(texts)
+            if self._first_batch:
+                detected = {code for code in codes if code != "unknown"}
+                if len(detected) == 1 and sum(code != "unknown" for code in codes) >= self.min_docs:
+                    self.language = detected.pop()
+                self._first_batch = False
+            return codes
+
+        detectable = [len(text.strip()) >= MIN_DETECTION_CHARS if text else False for text in texts]
+        candidates = [text for text, ok in zip(texts, detectable) if ok]
+        if candidates:
+            step = max(1, len(candidates) // 8)
+            spots = candidates[::step] + [candidates[-1]]
+            if any(code != self.language for code in detect_languages(spots)):
+                print("Langue hétérogène détectée, détection document par document")
+                self.language = None
+                return detect_languages(texts)
+        return [self.language if ok else "unknown" for ok in detectable]
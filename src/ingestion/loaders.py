@@ -2,17 +2,69 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader, CSVLoader, PyPDFLoader
 from langchain_community.document_loaders.powerpoint import UnstructuredPowerPointLoader
 from langchain_community.document_loaders import UnstructuredWordDocumentLoader
-from langchain_community.document_loaders import DataFrameLoader
+from langchain_core.documents import Document
+import openpyxl
 import pandas as pd
-import re
+from pandas.api.types import is_string_dtype
+from pandas.io.parsers import TextParser
+import itertools
+import json
+import os
 import hashlib
+import re
+import sqlite3
 from src.ingestion.pipeline import vector_store, init_vector_store
-from src.config import CHUNK_OVERLAP, CHUNK_SIZE, PSYCOPG2_CONNECTION_STRING
+from src.config import (
+    CHUNK_OVERLAP, CHUNK_SIZE, PSYCOPG2_CONNECTION_STRING, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_TOKENS_PER_BATCH,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_MAX_IN_FLIGHT, embeddings,
+    LANGUAGE_BATCH_SIZE, SHARED_EMBEDDINGS_ENABLED, CHUNK_WRITE_FLUSH_ROWS,
+)
+from src.embedding_scheduler import estimate_tokens
 from src.db.connection import get_scoped_connection
-from lingua import Language, LanguageDetectorBuilder
-
-# Initialize the language detector once
-detector = LanguageDetectorBuilder.from_languages(Language.FRENCH, Language.ENGLISH).build()
+from src.db.chunk_writer import ChunkWriter
+from src.db.corpus_versions import bump_corpus_version
+from src.db.shared_embeddings import SharedEmbeddings
+from src.ingestion.embedding_cache import EmbeddingCache
+from src.ingestion.cleaning import clean_text, clean_documents
+from src.ingestion.language import FileLanguageDetector, detect_language
+
+# Rows read at once from an Excel sheet in read-only mode
+EXCEL_ROWS_PER_BLOCK = 5000
+# Texts pandas reads as booleans, and as integers rather than floats
+EXCEL_TRUE_TEXTS = {"True", "TRUE", "true"}
+EXCEL_BOOL_TEXTS = EXCEL_TRUE_TEXTS | {"False", "FALSE", "false"}
+EXCEL_INT_TEXT = re.compile(r"\s*[-+]?\d+\s*")
+
+# Opened on first use, see get_embedding_cache()
+embedding_cache = None
+
+shared_embeddings = SharedEmbeddings(PSYCOPG2_CONNECTION_STRING) if SHARED_EMBEDDINGS_ENABLED else None
+
+def get_embedding_cache():
+    """
+    Returns the process-wide embedding cache, or None if it is disabled.
+    """
+    global embedding_cache
+    if embedding_cache is None and EMBEDDING_CACHE_ENABLED:
+        try:
+            embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES)
+        except (sqlite3.Error, OSError) as e:
+            # the cache only saves embedding calls: indexing goes on without it
+            print(f"Cache embeddings indisponible: {e}")
+    return embedding_cache
+
+def put_in_embedding_cache(cache, items):
+    """
+    Store vectors in the local embedding cache, if any. A cache error (locked or corrupted
+    file, full disk) is logged and ignored: the vectors are already computed.
+    :param items: List of (chunk_hash, vector)
+    """
+    if not cache:
+        return
+    try:
+        cache.put_many(embeddings.model, items)
+    except sqlite3.Error as e:
+        print(f"Erreur lors de l'écriture du cache d'embeddings: {e}")
 
 def get_chunk_hash(content: str) -> str:
     """
@@ -22,43 +74,25 @@ def get_chunk_hash(content: str) -> str:
     """
     return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-def chunk_exists_in_db(chunk_hash: str, user_id: str) -> bool:
+def get_existing_chunk_hashes(source_id: str, user_id: str) -> dict:
     """
-    Verify if a chunk_hash already exists in the database via direct SQL query.
-    :param chunk_hash: The hash of the chunk to verify
-    :return: True if the chunk exists, False otherwise
+    Fetch all chunk hashes already indexed for a source file, with their metadata, scoped to
+    a user, in one query. Database errors are raised: the file fails instead of being
+    re-indexed from an empty set.
+    :param source_id: The source file the chunks belong to
+    :param user_id: The user these chunks belong to
+    :return: Dict chunk hash -> stored metadata
     """
-    try:
-        with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, user_id) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM langchain_pg_embedding WHERE cmetadata->>'chunk_hash' = %s AND cmetadata->>'user_id' = %s LIMIT 1",
-                    (chunk_hash, user_id)
-                )
-                return cur.fetchone() is not None
-    except Exception as e:
-        print(f"Erreur lors de la vérification du chunk: {e}")
-        return False
-
-def delete_chunk_by_hash(chunk_hash: str, user_id: str) -> bool:
-    """
-    Delete a chunk from the database via its hash, scoped to a user.
-    :param chunk_hash: The hash of the chunk to delete
-    :param user_id: The user this chunk belongs to
-    :return: True if deleted, False otherwise
-    """
-    try:
-        with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, user_id) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "DELETE FROM langchain_pg_embedding WHERE cmetadata->>'chunk_hash' = %s AND cmetadata->>'user_id' = %s",
-                    (chunk_hash, user_id)
-                )
-                conn.commit()
-                return cur.rowcount > 0
-    except Exception as e:
-        print(f"Erreur lors de la suppression du chunk: {e}")
-        return False
+    with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, user_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT ON (chunk_hash) chunk_hash, cmetadata FROM langchain_pg_embedding
+                WHERE source_id = %s AND user_id = %s
+                """,
+                (source_id, user_id)
+            )
+            return {row[0]: row[1] for row in cur.fetchall() if row[0]}
 
 def delete_chunks_by_source(source_id: str, user_id: str) -> int:
     """
@@ -71,287 +105,569 @@ def delete_chunks_by_source(source_id: str, user_id: str) -> int:
                 cur.execute(
                     """
                     DELETE FROM langchain_pg_embedding
-                    WHERE cmetadata->>'source_id' = %s AND cmetadata->>'user_id' = %s
+                    WHERE source_id = %s AND user_id = %s
                     """,
                     (source_id, user_id)
                 )
+                deleted = cur.rowcount
+                if deleted:
+                    bump_corpus_version(cur, user_id)
                 conn.commit()
-                return cur.rowcount
+                return deleted
     except Exception as e:
         print(f"Erreur lors de la suppression des chunks du fichier {source_id}: {e}")
         return 0
 
-def upsert_chunks(chunks, user_id):
+def iter_embedding_batches(chunks, batch_size: int = EMBEDDING_BATCH_SIZE, max_tokens: int = EMBEDDING_MAX_TOKENS_PER_BATCH):
+    """
+    Groups chunks into batches respecting the max inputs and max tokens per embedding request.
+    :param chunks: Iterable of document chunks
+    :param batch_size: Maximum number of chunks per batch
+    :param max_tokens: Maximum estimated tokens per batch
+    :return: Generator of lists of chunks
+    """
+    batch = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.page_content)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def embed_chunks(chunks):
+    """
+    Returns the embeddings of a batch of chunks, reusing the vectors found in the local
+    embedding cache, then in the embeddings shared between users, and calling the
+    embedding model only for the chunks found in neither.
+    :param chunks: Batch of chunks with a chunk_hash in their metadata
+    :return: List of vectors, in the same order as the chunks
+    """
+    cache = get_embedding_cache()
+    hashes = [chunk.metadata["chunk_hash"] for chunk in chunks]
+    vectors = {}
+    if cache:
+        try:
+            vectors = cache.get_many(embeddings.model, hashes)
+        except sqlite3.Error as e:
+            # read as misses: the shared store or the model gives the vectors
+            print(f"Erreur lors de la lecture du cache d'embeddings: {e}")
+
+    missing = [chunk for chunk in chunks if chunk.metadata["chunk_hash"] not in vectors]
+    if missing and shared_embeddings:
+        try:
+            shared = shared_embeddings.get_many(embeddings.model, [chunk.metadata["chunk_hash"] for chunk in missing])
+        except Exception as e:
+            print(f"Erreur lors de la lecture des embeddings partagés: {e}")
+            shared = {}
+        if shared:
+            vectors.update(shared)
+            put_in_embedding_cache(cache, list(shared.items()))
+            missing = [chunk for chunk in missing if chunk.metadata["chunk_hash"] not in shared]
+
+    if missing:
+        new_vectors = embeddings.embed_documents([chunk.page_content for chunk in missing])
+        computed = list(zip((chunk.metadata["chunk_hash"] for chunk in missing), new_vectors))
+        vectors.update(computed)
+        put_in_embedding_cache(cache, computed)
+        if shared_embeddings:
+            try:
+                shared_embeddings.put_many(embeddings.model, computed)
+            except Exception as e:
+                print(f"Erreur lors du partage des embeddings: {e}")
+
+    return [vectors[chunk_hash] for chunk_hash in hashes]
+
+def upsert_chunks(chunks, user_id, source_id=None):
     """
-    Inserts or updates chunks in the vector store using the hash as a unique key.
-    Uses a direct SQL query to check for existence (without embedding).
-    :param chunks: List of document chunks to insert
-    :return: Number of chunks inserted/updated
+    Synchronizes the chunks of a source file with the vector store, using the hash as a unique key.
+    The hashes already indexed for the file are fetched in one query and diffed against the
+    incoming chunks: unchanged chunks are skipped (no delete, no re-embedding), new chunks are
+    embedded (through the embedding cache) and written in batches with COPY, and chunks that
+    vanished from the file are deleted in one query at the end, in the same transaction.
+    Unchanged chunks that moved in the file (other page, sheet...) only get their metadata
+    rewritten, without re-embedding.
+    Chunks are consumed as a stream: only one window of new chunks and the set of seen
+    hashes are kept in memory, whatever the size of the file.
+    :param chunks: Iterable of document chunks of one source file
     :param user_id: the user these chunks belong to
+    :param source_id: the source file of the chunks (defaults to the chunks' source_id metadata)
+    :return: Dict with the number of added, reused and removed chunks
     """
     global vector_store
     if vector_store is None:
         vector_store = init_vector_store()
 
-    inserted_count = 0
-    updated_count = 0
+    chunks = iter(chunks)
+    if source_id is None:
+        first = next(chunks, None)
+        if first is None:
+            return {"added": 0, "reused": 0, "removed": 0}
+        source_id = first.metadata.get("source_id")
+        chunks = itertools.chain([first], chunks)
+
+    existing_hashes = get_existing_chunk_hashes(source_id, user_id)
+    seen_hashes = set()
+    reused_count = 0
+    added_count = 0
+
+    def new_chunks():
+        nonlocal reused_count
+        for chunk in chunks:
+            chunk_hash = get_chunk_hash(chunk.page_content)
+
+            # add the hash in metadata for tracking
+            chunk.metadata["chunk_hash"] = chunk_hash
+            chunk.metadata["user_id"] = user_id
+            chunk.metadata["source_id"] = source_id
+
+            # the same content twice in one file is indexed once
+            if chunk_hash in seen_hashes:
+                continue
+            seen_hashes.add(chunk_hash)
+            if chunk_hash in existing_hashes:
+                reused_count += 1
+                # compared as stored: json round trip of the metadata
+                metadata = json.loads(json.dumps(chunk.metadata))
+                if metadata != existing_hashes[chunk_hash]:
+                    writer.update_metadata(chunk_hash, metadata)
+                continue
+            yield chunk
+
+    # embed up to EMBEDDING_MAX_IN_FLIGHT batches concurrently (the scheduler splits them
+    # into requests), then stream the new chunks to the database with COPY, one batch at a
+    # time; the whole file (inserts and deletes) is committed in a single transaction
+    window_batches = iter_embedding_batches(
+        new_chunks(),
+        batch_size=EMBEDDING_BATCH_SIZE * EMBEDDING_MAX_IN_FLIGHT,
+        max_tokens=EMBEDDING_MAX_TOKENS_PER_BATCH * EMBEDDING_MAX_IN_FLIGHT,
+    )
+    with ChunkWriter(PSYCOPG2_CONNECTION_STRING, user_id, flush_rows=CHUNK_WRITE_FLUSH_ROWS) as writer:
+        for window in window_batches:
+            vectors = dict(zip((chunk.metadata["chunk_hash"] for chunk in window), embed_chunks(window)))
+            for batch in iter_embedding_batches(window):
+                writer.write(
+                    [chunk.page_content for chunk in batch],
+                    [vectors[chunk.metadata["chunk_hash"]] for chunk in batch],
+                    [chunk.metadata for chunk in batch],
+                )
+            added_count += len(window)
+
+        removed_count = writer.delete_hashes(existing_hashes.keys() - seen_hashes, source_id)
+
+    # the last metadata updates are applied when the writer commits
+    print(
+        f"Chunks traités : {added_count} insérés, {reused_count} inchangés "
+        f"(dont {writer.updated} métadonnées mises à jour), {removed_count} supprimés"
+    )
+    cache = get_embedding_cache()
+    if cache:
+        # counters only: the file is committed, a locked cache must not fail it now
+        print(f"Cache embeddings : {cache.hits} hits, {cache.misses} misses")
+    if shared_embeddings:
+        print(f"Embeddings partagés : {shared_embeddings.hits} hits, {shared_embeddings.misses} misses")
+    return {"added": added_count, "reused": reused_count, "removed": removed_count}
+
+def iter_chunks(docs, path, user_id, source_id, file_type, language_detector=None, **metadata):
+    """
+    Streams documents (pages, rows, elements...) through clean -> metadata -> language -> split,
+    in small batches of documents, so a file is never fully materialized in memory.
+    :param docs: Iterable of documents, typically a loader's lazy_load()
+    :param path: Path of the source file
+    :param source_id: Unique identifier for the source file
+    :param file_type: File type stored in the metadata
+    :param language_detector: Detection state of the file, to share it between several calls for the same file
+    :param metadata: Extra metadata added to every document
+    :return: Generator of chunks
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    language_detector = language_detector or FileLanguageDetector()
+    docs = iter(docs)
+    while True:
+        batch = list(itertools.islice(docs, LANGUAGE_BATCH_SIZE))
+        if not batch:
+            break
+        clean_documents(batch)
+        languages = language_detector.detect_batch([d.page_content for d in batch])
+        for d, language in zip(batch, languages):
+            d.metadata["source"] = path
+            d.metadata["source_id"] = source_id or path
+            d.metadata["file_type"] = file_type
+            d.metadata.update(metadata)
+            d.metadata["language"] = language
+            d.metadata["user_id"] = user_id
+            yield from splitter.split_documents([d])
 
-    for chunk in chunks:
-        chunk_hash = get_chunk_hash(chunk.page_content)
-        
-        # add the hash in metadata for tracking
-        chunk.metadata["chunk_hash"] = chunk_hash
-        chunk.metadata["user_id"] = user_id
-        
-        # Verify if this chunk already exists via direct SQL
-        if chunk_exists_in_db(chunk_hash, user_id):
-            # chunk already exists, we delete it and re-insert it
-            delete_chunk_by_hash(chunk_hash, user_id)
-            updated_count += 1
-        else:
-            inserted_count += 1
-        
-        # insert the chunk (new or updated)
-        vector_store.add_documents([chunk])
-    
-    print(f"Chunks traités : {inserted_count} insérés, {updated_count} mis à jour")
-    return inserted_count + updated_count
-
-def detect_language(text):
-    """
-    Detects the language of a text.
-    :param text: Text to analyze
-    :return: ISO code of the language (e.g., 'fr', 'en') or 'unknown' if not detectable
+def parse_pdf(path, user_id, source_id=None):
     """
+    Stream the chunks of a PDF file page by page, without indexing.
+    :param path: Path to the PDF file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    loader = PyPDFLoader(path)
+    return iter_chunks(loader.lazy_load(), path, user_id, source_id, "pdf")
+
+def parse_txt(path, user_id, source_id=None):
+    """
+    Stream the chunks of a TXT file, without indexing.
+    :param path: Path to the TXT file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    loader = TextLoader(path)
+    return iter_chunks(loader.lazy_load(), path, user_id, source_id, "txt")
+
+def parse_pptx(path, user_id, source_id=None):
+    """
+    Stream the chunks of a PPTX file element by element, without indexing.
+    :param path: Path to the PPTX file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    loader = UnstructuredPowerPointLoader(path, mode ="elements")
+    return iter_chunks(loader.lazy_load(), path, user_id, source_id, "pptx")
+
+def excel_cell_value(value):
+    """
+    Cell value as pandas.read_excel passes it to its parser: empty cells as "", integral
+    floats as int.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def excel_bool_value(value):
+    """
+    "TRUE"/"FALSE" texts as the booleans pandas converts them to, other values unchanged.
+    """
+    if isinstance(value, str) and value in EXCEL_BOOL_TEXTS:
+        return value in EXCEL_TRUE_TEXTS
+    return value
+
+def iter_excel_values(sheet, rows_per_block: int, width=None):
+    """
+    Cell values of the rows of a sheet after its header, in blocks of rows (see excel_cell_value).
+    :param width: Number of columns read, all of them if None
+    """
+    rows = sheet.iter_rows(min_row=2, max_col=width, values_only=True)
+    while True:
+        values = [[excel_cell_value(v) for v in row] for row in itertools.islice(rows, rows_per_block)]
+        if not values:
+            return
+        yield values
+
+def is_blank_row(row) -> bool:
+    """
+    Whether all the cells of a row (see excel_cell_value) are empty.
+    """
+    return all(value == "" for value in row)
+
+def excel_value_classes(values) -> dict:
+    """
+    One value of each class of cell values pandas' type inference tells apart: the type of
+    the value and, for a text, whether it reads as empty, a boolean, an integer, another
+    number or none of these. A column is typed the same from these values as from all of them.
+    :param values: Cell values of a column (see excel_cell_value)
+    :return: Dict class -> first value of the class
+    """
+    # inference depends on the order of the values too: classes are kept in order of appearance
+    first = {}
+    for value in values:
+        first.setdefault((type(value), value) if isinstance(value, str) else type(value), value)
+    texts = [value for value in first.values() if isinstance(value, str)]
+    text_classes = {}
+    if texts:
+        # pandas decides what reads as missing (na_values) and as a number
+        empty = TextParser([[text, 0] for text in texts], header=None, dtype={0: object}).read()[0].isna()
+        numbers = pd.to_numeric(pd.Series(texts, dtype=object), errors="coerce")
+        for text, is_empty, number in zip(texts, empty, numbers):
+            if is_empty:
+                text_classes[text] = "empty text"
+            elif text in EXCEL_BOOL_TEXTS:
+                text_classes[text] = "bool text"
+            elif pd.isna(number):
+                text_classes[text] = "text"
+            elif EXCEL_INT_TEXT.fullmatch(text):
+                text_classes[text] = "int text"
+            else:
+                text_classes[text] = "number text"
+    classes = {}
+    for key, value in first.items():
+        classes.setdefault(text_classes[value] if isinstance(value, str) else key, value)
+    return classes
+
+def excel_sheet_dtypes(sheet, header, rows_per_block: int):
+    """
+    Columns of a sheet and their types as pandas.read_excel infers them from the whole
+    column, in one pass over the rows: only one value of each class seen so far (see
+    excel_value_classes) is parsed per column. A column that stays object with its raw
+    values is settled, whatever comes next. The columns go up to the last named header
+    cell or the last non-empty cell of any row, like read_excel counts them.
+    :param sheet: Read-only worksheet
+    :param header: Values of the header row
+    :param rows_per_block: Rows read at once
+    :return: (number of columns, dtypes by column index, indexes of the columns kept as raw
+        values, the rows of the sheet if they fit in one block, else None)
+    """
+    width = max((i + 1 for i, name in enumerate(header) if name is not None), default=0)
+    classes = []
+    dtypes = {}
+    raw = set()
+    first = None
+    # read_excel keeps the blank rows (as missing values) unless they end the sheet: a blank
+    # row only counts once a filled row follows it
+    blank_pending = False
+    seen = False
+    for count, values in enumerate(iter_excel_values(sheet, rows_per_block)):
+        first = values if count == 0 else None
+        end = len(values)
+        while end and is_blank_row(values[end - 1]):
+            end -= 1
+        if end == 0:
+            blank_pending = True
+            continue
+        values, blank_pending = ([[]] if blank_pending else []) + values[:end], end < len(values)
+        for row in values:
+            for i in range(len(row) - 1, width - 1, -1):
+                if row[i] != "":
+                    width = i + 1
+                    break
+        # a column first filled in this block was empty in the rows before
+        classes.extend(({"empty text": ""} if seen else {}) for _ in range(width - len(classes)))
+        seen = True
+        probe = {}
+        for i in range(width):
+            if i in raw:
+                continue
+            for key, value in excel_value_classes(row[i] if i < len(row) else "" for row in values).items():
+                classes[i].setdefault(key, value)
+            probe[i] = list(classes[i].values()) or [""]
+        if not probe:
+            continue
+        height = max(len(column) for column in probe.values())
+        # columns padded with their own first value, and a filled column so no row is blank
+        rows = [[column[j] if j < len(column) else column[0] for column in probe.values()] + [0] for j in range(height)]
+        parsed = TextParser(rows, header=None).read()
+        for position, i in enumerate(probe):
+            column = parsed.iloc[:, position]
+            dtypes[i] = column.dtype
+            # object (or str) column whose values were not converted to booleans: raw values
+            if is_string_dtype(column.dtype) and not all(isinstance(v, bool) for v in column.dropna()):
+                raw.add(i)
+    if first is not None:
+        first = [row[:width] + [""] * (width - len(row)) for row in first]
+    return width, dtypes, raw, first
+
+def iter_excel_blocks(path, rows_per_block: int = EXCEL_ROWS_PER_BLOCK):
+    """
+    Read an Excel workbook in read-only (streaming) mode, sheet by sheet, in blocks of rows.
+    The first row of each sheet is used as header and values are typed like pandas.read_excel,
+    over the whole column: a first pass over the sheet settles the columns and their types
+    (see excel_sheet_dtypes), every block is then cast to them, so the rendering of a cell
+    does not depend on the block it falls in. A sheet that fits in one block is read once.
+    :param path: Path to the Excel file
+    :param rows_per_block: Maximum number of rows per DataFrame block
+    :return: Generator of (sheet_name, DataFrame block)
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
     try:
-        if not text or len(text.strip()) < 10:  # Besoin d'au moins 10 caractères
-            return "unknown"
-        lang = detector.detect_language_of(text)
-        return lang.iso_code_639_1.name.lower() if lang else "unknown"
-    except Exception as e:
-        print(f"Erreur lors de la détection de langue: {e}")
-        return "unknown"
-
-def clean_text(text):
-    """
-    Removes problematic characters and normalizes the text.
-    - Null characters
-    - Invisible characters (Zero-Width)
-    - Multiple spaces
-    :param text: Text to clean
-    :return: Cleaned text
-    """
-    if not text:
-        return text
-    
-    #Delete null characters
-    text = text.replace('\x00', '').replace('\0', '')
-
-    #Delete control characters ASCII (except for common whitespace)
-    text = re.sub(r'[\x01-\x08\x0b\x0c\x0e-\x1f\x7f]', ' ', text)
-    
-    #Delete invisible characters
-    text = re.sub(r"[\u200b\u200c\u200d\ufeff]", "", text)
-
-    #Escape backslashes that are not already escaped
-    text = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', text)
-    
-    #normalize multiple spaces to a single space
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
-
-def clean_documents(docs):
-    """
-    Cleans all documents by removing NUL characters from content and metadata.
-    :param docs: List of documents to clean
-    :return: List of cleaned documents
-    """
-    for d in docs:
-        # clean the content
-        d.page_content = clean_text(d.page_content)
-        
-        # Clean the metadata
-        for key, value in d.metadata.items():
-            if isinstance(value, str):
-                d.metadata[key] = clean_text(value)
-    
-    return docs
+        for sheet in workbook.worksheets:
+            header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+            if header is None:
+                continue
+            width, dtypes, raw, values = excel_sheet_dtypes(sheet, header, rows_per_block)
+            if width == 0:
+                continue
+            columns = [
+                str(header[i]) if i < len(header) and header[i] is not None else f"Unnamed: {i}"
+                for i in range(width)
+            ]
+            blocks = [values] if values is not None else iter_excel_values(sheet, rows_per_block, width)
+            for values in blocks:
+                # blank rows would only give empty rows, dropped from the text anyway
+                values = [row for row in values if not is_blank_row(row)]
+                if not values:
+                    continue
+                # same cell conversions as pandas.read_excel; raw columns are left unconverted
+                block = TextParser(values, header=None, dtype=dict.fromkeys(raw, object) or None).read()
+                block = block.reindex(columns=range(width))
+                for i, dtype in dtypes.items():
+                    column = block[i]
+                    if i not in raw and column.dtype == object:
+                        # booleans next to "TRUE"/"FALSE" texts, left unconverted in this block alone
+                        column = column.map(excel_bool_value)
+                    if column.dtype != dtype:
+                        column = column.astype(dtype)
+                    block[i] = column
+                block.columns = columns
+                yield sheet.title, block
+    finally:
+        workbook.close()
+
+def excel_cell_text(value) -> str:
+    """
+    Text of a cell, as str() rendered it in the rows of pandas.read_excel (empty cells 'nan',
+    missing dates 'NaT', dates '2024-01-02 00:00:00'), so the chunk hashes are unchanged.
+    """
+    return "nan" if value is None else str(value)
 
-def ingest_pdf(path, user_id, source_id=None):
+def excel_rows_to_text(df):
     """
-    Ingest a PDF file, split it into chunks, and index it in the vector store.
-    :param path: Path to the PDF file to be ingested
+    Build the text of each row (' | '.join of its cells) column by column instead of a
+    per-row apply. Empty rows are dropped, empty cells are rendered like the previous
+    pandas-based path (see excel_cell_text).
+    :param df: Block of rows
+    :return: Series of row texts
+    """
+    df = df.dropna(how="all")
+    # apply(axis=1) rendered each row as a Series of the common type of the columns
+    # (ints next to a float column read 1.0): same upcast
+    common = df.iloc[:0].to_numpy().dtype
+    if common != object:
+        df = df.astype(common)
+    text = None
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i].astype(object).map(excel_cell_text)
+        text = column if text is None else text + " | " + column
+    return text if text is not None else pd.Series(dtype=object)
+
+def parse_excel(path, user_id, source_id=None):
+    """
+    Stream the chunks of an Excel file block of rows by block of rows, without indexing.
+    :param path: Path to the Excel file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    language_detector = FileLanguageDetector()
+    for sheet_name, block in iter_excel_blocks(path):
+        docs = (Document(page_content=text) for text in excel_rows_to_text(block))
+        yield from iter_chunks(docs, path, user_id, source_id, "excel", language_detector, sheet_name=sheet_name)
+
+def parse_csv(path, user_id, source_id=None):
+    """
+    Stream the chunks of a CSV file row by row, without indexing.
+    :param path: Path to the CSV file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    loader = CSVLoader(path, encoding="utf-8")
+    return iter_chunks(loader.lazy_load(), path, user_id, source_id, "csv")
+
+def parse_docx(path, user_id, source_id=None):
+    """
+    Stream the chunks of a DOCX file, without indexing.
+    :param path: Path to the DOCX file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    loader = UnstructuredWordDocumentLoader(path)
+    return iter_chunks(loader.lazy_load(), path, user_id, source_id, "docx")
+
+# parsing function for each supported extension
+PARSERS = {
+    '.pdf': parse_pdf,
+    '.txt': parse_txt,
+    '.pptx': parse_pptx,
+    '.xlsx': parse_excel,
+    '.csv': parse_csv,
+    '.docx': parse_docx,
+}
+
+def iter_file_chunks(path, user_id, source_id=None):
+    """
+    Stream the chunks of any supported file.
+    :param path: Path to the file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: Generator of chunks
+    """
+    parse = PARSERS.get(os.path.splitext(path)[1].lower())
+    if parse is None:
+        raise ValueError(f"Unsupported file type: {path}")
+    return parse(path, user_id, source_id)
+
+def parse_file(path, user_id, source_id=None):
+    """
+    Parse any supported file into a list of chunks. Top-level function so it can run
+    in a worker process (the chunks are sent back to the parent in one piece).
+    :param path: Path to the file to be parsed
+    :param source_id: Unique identifier for the source file
+    :return: List of chunks
+    """
+    return list(iter_file_chunks(path, user_id, source_id))
+
+def index_chunks(chunks, user_id, source_id):
+    """
+    Index the chunks of a parsed file in the vector store.
+    :param chunks: Iterable of chunks of the file (a generator streams the file)
     :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
     """
     global vector_store
     if vector_store is None:
         vector_store = init_vector_store()
 
-    loader = PyPDFLoader(path)
-    docs = loader.load()
-    docs = clean_documents(docs)
-    for d in docs:
-        d.metadata["source"] = path
-        d.metadata["source_id"] = source_id or path
-        d.metadata["file_type"] = "pdf"
-        d.metadata["language"] = detect_language(d.page_content)
-        d.metadata["user_id"] = user_id
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(docs)
-    
-    print(f"Indexing of {len(chunks)} chunks...")
-    upsert_chunks(chunks, user_id)
+    print(f"Indexing of {source_id}...")
+    report = upsert_chunks(chunks, user_id, source_id)
     print(f"Chunks processed with upsert logic.")
-    return vector_store
+    return report
+
+def ingest_pdf(path, user_id, source_id=None):
+    """
+    Ingest a PDF file, split it into chunks, and index it in the vector store.
+    :param path: Path to the PDF file to be ingested
+    :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
+    """
+    return index_chunks(parse_pdf(path, user_id, source_id), user_id, source_id or path)
 
 def ingest_txt(path, user_id, source_id=None):
     """
     Ingest a TXT file, split it into chunks, and index it in the vector store.
     :param path: Path to the TXT file to be ingested
     :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
     """
-    global vector_store
-    if vector_store is None:
-        vector_store = init_vector_store()
-
-    loader = TextLoader(path)
-    docs = loader.load()
-    docs = clean_documents(docs)
-    for d in docs:
-        d.metadata["source"] = path
-        d.metadata["source_id"] = source_id or path
-        d.metadata["file_type"] = "txt"
-        d.metadata["language"] = detect_language(d.page_content)
-        d.metadata["user_id"] = user_id
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(docs)
-    
-    print(f"Indexing of {len(chunks)} chunks...")
-    upsert_chunks(chunks, user_id)
-    print(f"Chunks processed with upsert logic.")
-    return vector_store
+    return index_chunks(parse_txt(path, user_id, source_id), user_id, source_id or path)
 
 def ingest_pptx(path, user_id, source_id=None):
     """
     Ingest a PPTX file, split it into chunks, and index it in the vector store.
     :param path: Path to the PPTX file to be ingested
     :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
     """
-    global vector_store
-    if vector_store is None:
-        vector_store = init_vector_store()
-
-    loader = UnstructuredPowerPointLoader(path, mode ="elements")
-    docs = loader.load()
-    docs = clean_documents(docs)
-    for d in docs:
-        d.metadata["source"] = path
-        d.metadata["source_id"] = source_id or path
-        d.metadata["file_type"] = "pptx"
-        d.metadata["language"] = detect_language(d.page_content)
-        d.metadata["user_id"] = user_id
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(docs)
-
-    print(f"Indexing of {len(chunks)} chunks...")
-    upsert_chunks(chunks, user_id)
-    print(f"Chunks processed with upsert logic.")
-    return vector_store
+    return index_chunks(parse_pptx(path, user_id, source_id), user_id, source_id or path)
 
 def ingest_excel(path, user_id, source_id=None):
     """
     Ingest an Excel file, split it into chunks, and index it in the vector store.
     :param path: Path to the Excel file to be ingested
     :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
     """
-    global vector_store
-    if vector_store is None:
-        vector_store = init_vector_store()
-
-    xls = pd.ExcelFile(path)
-    docs = []
-
-    for sheet_name in xls.sheet_names:
-        df = pd.read_excel(xls, sheet_name=sheet_name)
-        # concat all columns into a single text string
-        df['_text'] = df.apply(lambda row: ' | '.join(map(str, row)), axis=1)
-        loader = DataFrameLoader(df, page_content_column="_text")
-        sheet_docs = loader.load()
-        sheet_docs = clean_documents(sheet_docs)
-        for d in sheet_docs:
-            d.metadata["source"] = path
-            d.metadata["source_id"] = source_id or path
-            d.metadata["file_type"] = "excel"
-            d.metadata["sheet_name"] = sheet_name
-            d.metadata["language"] = detect_language(d.page_content) 
-            d.metadata["user_id"] = user_id
-        docs.extend(sheet_docs)
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(docs)
-
-    print(f"Indexing of {len(chunks)} chunks...")
-    upsert_chunks(chunks, user_id)
-    print(f"Chunks processed with upsert logic.")
-    return vector_store
+    return index_chunks(parse_excel(path, user_id, source_id), user_id, source_id or path)
 
 def ingest_csv(path, user_id, source_id=None):
     """
     Ingest a CSV file, split it into chunks, and index it in the vector store.
     :param path: Path to the CSV file to be ingested
     :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
     """
-    global vector_store
-    if vector_store is None:
-        vector_store = init_vector_store()
-
-    loader = CSVLoader(path, encoding="utf-8")
-    docs = loader.load()
-    docs = clean_documents(docs)
-    for d in docs:
-        d.metadata["source"] = path
-        d.metadata["source_id"] = source_id or path
-        d.metadata["file_type"] = "csv"
-        d.metadata["language"] = detect_language(d.page_content)
-        d.metadata["user_id"] = user_id
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(docs)
-    
-    print(f"Indexing of {len(chunks)} chunks...")
-    upsert_chunks(chunks, user_id)
-    print(f"Chunks processed with upsert logic.")
-    return vector_store
+    return index_chunks(parse_csv(path, user_id, source_id), user_id, source_id or path)
 
 def ingest_docx(path, user_id, source_id=None):
     """
     Ingest a DOCX file, split it into chunks, and index it in the vector store.
     :param path: Path to the DOCX file to be ingested
     :param source_id: Unique identifier for the source file
+    :return: Dict with the number of added, reused and removed chunks
     """
-    global vector_store
-    if vector_store is None:
-        vector_store = init_vector_store()
-
-    loader = UnstructuredWordDocumentLoader(path)
-    docs = loader.load()
-    docs = clean_documents(docs)
-    for d in docs:
-        d.metadata["source"] = path
-        d.metadata["source_id"] = source_id or path
-        d.metadata["file_type"] = "docx"
-        d.metadata["language"] = detect_language(d.page_content)
-        d.metadata["user_id"] = user_id
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(docs)
-    
-    print(f"Indexing of {len(chunks)} chunks...")
-    upsert_chunks(chunks, user_id)
-    print(f"Chunks processed with upsert logic.")
-    return vector_store
\ No newline at end of file
+    return index_chunks(parse_docx(path, user_id, source_id), user_id, source_id or path)
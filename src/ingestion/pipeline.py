@@ -1,6 +1,8 @@
 from src.config import CONNECTION_STRING, embeddings, PSYCOPG2_CONNECTION_STRING
 from langchain_community.vectorstores import PGVector
-import psycopg2
+from src.db.connection import get_scoped_connection
+from src.db.partitions import truncate_user_partition
+from src.db.corpus_versions import bump_corpus_version
 
 vector_store = None
 
@@ -29,13 +31,16 @@ def clear_user_collection(user_id: str) -> bool:
     global vector_store
     
     try:
-        with psycopg2.connect(PSYCOPG2_CONNECTION_STRING) as conn:
+        with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, user_id) as conn:
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM document_catalog WHERE user_id = %s;", (user_id,))
-                cur.execute(
-                    "DELETE FROM langchain_pg_embedding WHERE cmetadata->>'user_id' = %s;",
-                    (user_id,)
-                )
+                # list-partitioned layout: the user's partition is truncated instead
+                if not truncate_user_partition(cur, user_id):
+                    cur.execute(
+                        "DELETE FROM langchain_pg_embedding WHERE user_id = %s;",
+                        (user_id,)
+                    )
+                bump_corpus_version(cur, user_id)
                 conn.commit()
         print(f"Documents de l'utilisateur {user_id} supprimés.")
         return True
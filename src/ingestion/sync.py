@@ -1,93 +1,292 @@
 import os
 import psycopg2
+from pathlib import Path
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import get_context
 from src.db.catalog import DocumentCatalog
-from src.config import PSYCOPG2_CONNECTION_STRING
-from src.ingestion.loaders import ingest_pdf, ingest_txt, ingest_pptx, ingest_excel, ingest_csv, ingest_docx, delete_chunks_by_source
+from src.config import PSYCOPG2_CONNECTION_STRING, SYNC_WORKERS
+from src.db.connection import get_connection
+from src.ingestion.loaders import parse_file, iter_file_chunks, index_chunks, delete_chunks_by_source
 from src.ingestion import pipeline
 
 # extensions authorized for ingestion
 ALLOWED_EXTENSIONS = {'.txt', '.pptx', '.pdf', '.docx', '.xlsx', '.csv'}
 
-def sync_collection(directory: str, user_id: str):
+# Process pools parsing the files of the syncs of this process, per number of workers
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
     """
-    Synchronize the vector store with the files in the specified directory. 
-    It detects new, modified, and deleted files and updates the vector store accordingly.
-    Only txt, pptx, pdf, docx, xlsx and csv files are processed.
-    :param directory: The directory to synchronize (default is "data")
-    :return: Updated vector store
-    :param user_id: the user this sync belongs to
+    Process pool shared by every sync of this process: the spawned workers import the
+    ingestion modules (src.config, the embeddings client) once, not at every sync.
+    :param workers: Number of worker processes
+    :return: The pool
     """
-    global vector_store
-    print(f"SYNCHRONIZATION of the directory {directory} for user {user_id}...")
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            # spawn rather than fork: the API process runs threads and holds open connections
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            _parse_pools[workers] = pool
+        return pool
 
-    catalog = DocumentCatalog(PSYCOPG2_CONNECTION_STRING)
+def discard_parse_pool(workers: int, pool: ProcessPoolExecutor):
+    """
+    Forget a pool whose worker died (BrokenProcessPool), the next sync starts a new one.
+    """
+    with _parse_pools_lock:
+        if _parse_pools.get(workers) is pool:
+            del _parse_pools[workers]
+    pool.shutdown(wait=False)
 
-    if pipeline.vector_store is None:
-        pipeline.init_vector_store()
+def submit_parse(pool: ProcessPoolExecutor, file_info, user_id: str) -> Future:
+    try:
+        return pool.submit(parse_file, file_info["file_path"], user_id, file_info["source_id"])
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+        return future
 
-    current_files = catalog.scan_directory(directory, user_id)
-    if not current_files:
-        print("No files found in the directory.")
-        return pipeline.vector_store
+def parse_files(files, user_id: str, workers: int):
+    """
+    Parse files into chunks (load, clean, language detection, split), in a process pool
+    when workers > 1. Results are yielded in the order of the input files, and a failing
+    file yields its exception instead of stopping the others.
+    With a single worker the chunks are a lazy generator (bounded memory); with a pool each
+    file is parsed into a list that is sent back to this process, and at most 2 * workers
+    files are submitted ahead of the one being indexed, so the parsed chunks waiting for
+    the embedding do not grow with the size of the corpus.
+    :param files: List of file metadata dicts (file_path, source_id)
+    :param user_id: the user these files belong to
+    :param workers: Number of worker processes (1 parses in the current process)
+    :return: Generator of (file_info, chunks, error)
+    """
+    if workers <= 1:
+        # stream each file lazily: its chunks are produced while they are indexed
+        for file_info in files:
+            try:
+                yield file_info, iter_file_chunks(file_info["file_path"], user_id, file_info["source_id"]), None
+            except Exception as e:
+                yield file_info, None, e
+        return
 
-    # Filter to keep only allowed files
-    current_files = [
-        f for f in current_files 
-        if os.path.splitext(f["file_path"])[1].lower() in ALLOWED_EXTENSIONS
-    ]
-    
-    if not current_files:
-        print("No allowed files found in the directory (only txt, pptx, pdf, docx, xlsx, csv are processed).")
-        return pipeline.vector_store
+    pool = get_parse_pool(workers)
+    files = iter(files)
+    pending = deque((file_info, submit_parse(pool, file_info, user_id)) for file_info in itertools.islice(files, 2 * workers))
+    try:
+        while pending:
+            file_info, future = pending.popleft()
+            try:
+                chunks, error = future.result(), None
+            except Exception as e:
+                chunks, error = None, e
+                if isinstance(e, BrokenProcessPool):
+                    discard_parse_pool(workers, pool)
+            # submit the next file before yielding: it is parsed while this one is embedded
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append((next_file, submit_parse(pool, next_file, user_id)))
+            yield file_info, chunks, error
+    finally:
+        # abandoned sync: the files not started yet are not parsed for nothing
+        for _, future in pending:
+            future.cancel()
 
-    indexed_files = catalog.get_indexed_files(user_id)
-    indexed_set = {f["source_id"]for f in indexed_files}
+@contextmanager
+def sync_lock(directory: str, user_id: str):
+    """
+    Serializes the syncs of a user's directory across processes (API sync jobs, watcher
+    daemon): a Postgres transaction-level advisory lock keyed by (user_id, directory) is
+    taken on a dedicated pooled connection and held until the block exits.
+    :param directory: The synchronized directory
+    :param user_id: the user this sync belongs to
+    """
+    key = f"sync:{user_id}:{os.path.realpath(directory)}"
+    with get_connection(PSYCOPG2_CONNECTION_STRING) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (key,))
+        yield
 
-    to_add = [] 
-    to_delete = []
+def notify(progress, event: str, **data):
+    """
+    Send a progress event to the optional progress callback of a sync.
+    """
+    if progress is not None:
+        progress({"event": event, **data})
 
+def plan_changes(catalog: DocumentCatalog, current_files, indexed_by_source):
+    """
+    Compare files on disk with the catalog and return the new or modified ones.
+    Files whose content is unchanged but whose stat signature changed (touch, copy)
+    get their new signature stored, so they are not re-hashed next time.
+    :param catalog: The document catalog
+    :param current_files: File metadata dicts built by the catalog (scan_directory/describe_file)
+    :param indexed_by_source: Catalog entries by source_id
+    :return: List of file metadata dicts to (re-)index
+    """
+    to_add = []
     for file_info in current_files:
-        if file_info["source_id"] not in indexed_set:
+        existing_file = indexed_by_source.get(file_info["source_id"])
+        if existing_file is None:
             to_add.append(file_info)
             print(f"New File: {file_info['file_path']}")
-        else:
-            existing_file = next(f for f in indexed_files if f["source_id"] == file_info["source_id"])
-            if existing_file["content_hash"] != file_info["content_hash"]:
-                to_add.append(file_info)
-                to_delete.append(file_info["source_id"])
-                print(f"Modified File: {file_info['file_path']}")
-
-    current_set = {f["source_id"] for f in current_files}
-    for indexed in indexed_files:
-        if indexed["source_id"] not in current_set:
-            to_delete.append(indexed["source_id"])
-            print(f"Deleted File: {indexed['file_path']}")
-    print(f"{len(to_add)} to add, {len(to_delete)} to delete")
+        elif existing_file["content_hash"] != file_info["content_hash"]:
+            to_add.append(file_info)
+            print(f"Modified File: {file_info['file_path']}")
+        elif not catalog.signature_unchanged(file_info, existing_file):
+            catalog.add_or_update_file(file_info)
+    return to_add
+
+def apply_changes(catalog: DocumentCatalog, user_id: str, to_add, to_delete, workers: int, progress=None):
+    """
+    Remove deleted files from the vector store and the catalog, then (re-)index new and
+    modified files. Files are parsed in a pool of `workers` processes, then their chunks are
+    embedded and written in file order by the current process; a file that fails is reported
+    and skipped, and stays out of the catalog so the next sync retries it.
+    :param catalog: The document catalog
+    :param user_id: the user these files belong to
+    :param to_add: File metadata dicts to (re-)index
+    :param to_delete: source_ids of the files to remove
+    :param workers: Number of parsing processes
+    :param progress: Optional progress callback, see sync_collection
+    """
+    print(f"{len(to_add)} to add, {len(set(to_delete))} to delete")
+    notify(progress, "planned", to_add=[f["source_id"] for f in to_add], to_delete=sorted(set(to_delete)))
 
     if pipeline.vector_store is None:
         pipeline.init_vector_store()
     
-    for source_id in set(to_delete):
+    for source_id in sorted(set(to_delete)):
         print(f"Removal of {source_id} for user {user_id}...")
         delete_chunks_by_source(source_id, user_id)
         catalog.delete_file(source_id, user_id)
+        notify(progress, "file_deleted", source_id=source_id)
+
+    totals = {"added": 0, "reused": 0, "removed": 0}
+    errors = []
+    for file_info, chunks, error in parse_files(to_add, user_id, workers):
+        if error is None:
+            try:
+                report = index_chunks(chunks, user_id, file_info["source_id"])
+                catalog.add_or_update_file(file_info)
+            except Exception as e:
+                error = e
+        if error is not None:
+            print(f"Error while ingesting {file_info['file_path']}: {error}")
+            errors.append({"source_id": file_info["source_id"], "error": str(error)})
+            notify(progress, "file_failed", source_id=file_info["source_id"], error=str(error))
+            continue
+        for key in totals:
+            totals[key] += report[key]
+        notify(progress, "file_indexed", source_id=file_info["source_id"], report=report)
+
+    print(f"Chunks: {totals['reused']} reused, {totals['added']} added, {totals['removed']} removed")
+    if errors:
+        print(f"{len(errors)} file(s) failed: {', '.join(e['source_id'] for e in errors)}")
+
+def sync_collection(directory: str, user_id: str, workers: int = SYNC_WORKERS, progress=None):
+    """
+    Synchronize the vector store with the files in the specified directory. 
+    It detects new, modified, and deleted files and updates the vector store accordingly.
+    Modified files are re-chunked and diffed against the stored chunk hashes:
+    only new chunks are embedded and only vanished chunks are deleted.
+    Only txt, pptx, pdf, docx, xlsx and csv files are processed.
+    Files are parsed in a pool of `workers` processes, see apply_changes.
+    :param directory: The directory to synchronize (default is "data")
+    :return: Updated vector store
+    :param user_id: the user this sync belongs to
+    :param workers: Number of parsing processes (default SYNC_WORKERS)
+    :param progress: Optional callback receiving progress events as dicts
+        ("planned", "file_deleted", "file_indexed", "file_failed")
+    """
+    print(f"SYNCHRONIZATION of the directory {directory} for user {user_id}...")
 
-    for file_info in to_add:
-        catalog.add_or_update_file(file_info)
-        path = file_info["file_path"]
-
-        if path.endswith(".pdf"):
-            ingest_pdf(file_info["file_path"], user_id=user_id, source_id=file_info["source_id"])
-        elif path.endswith(".txt"):
-            ingest_txt(file_info["file_path"], user_id=user_id, source_id=file_info["source_id"])
-        elif path.endswith(".pptx"):
-            ingest_pptx(file_info["file_path"], user_id=user_id, source_id=file_info["source_id"])
-        elif path.endswith(".xlsx"):
-            ingest_excel(file_info["file_path"], user_id=user_id, source_id=file_info["source_id"])
-        elif path.endswith(".csv"):
-            ingest_csv(file_info["file_path"], user_id=user_id, source_id=file_info["source_id"])
-        elif path.endswith(".docx"):
-            ingest_docx(file_info["file_path"], user_id=user_id, source_id=file_info["source_id"])
+    with sync_lock(directory, user_id):
+        catalog = DocumentCatalog(PSYCOPG2_CONNECTION_STRING)
+
+        if pipeline.vector_store is None:
+            pipeline.init_vector_store()
+
+        indexed_files = catalog.get_indexed_files(user_id)
+        current_files = catalog.scan_directory(directory, user_id, indexed_files)
+        if not current_files:
+            print("No files found in the directory.")
+            return pipeline.vector_store
+
+        # Filter to keep only allowed files
+        current_files = [
+            f for f in current_files 
+            if os.path.splitext(f["file_path"])[1].lower() in ALLOWED_EXTENSIONS
+        ]
+    
+        if not current_files:
+            print("No allowed files found in the directory (only txt, pptx, pdf, docx, xlsx, csv are processed).")
+            return pipeline.vector_store
+
+        indexed_by_source = {f["source_id"]: f for f in indexed_files}
+        to_add = plan_changes(catalog, current_files, indexed_by_source)
+
+        to_delete = []
+        current_set = {f["source_id"] for f in current_files}
+        for indexed in indexed_files:
+            if indexed["source_id"] not in current_set:
+                to_delete.append(indexed["source_id"])
+                print(f"Deleted File: {indexed['file_path']}")
+
+        apply_changes(catalog, user_id, to_add, to_delete, workers, progress)
 
     print("Synchronization completed.")
-    return pipeline.vector_store
\ No newline at end of file
+    return pipeline.vector_store
+
+def sync_paths(directory: str, user_id: str, paths, workers: int = SYNC_WORKERS, progress=None):
+    """
+    Incremental sync restricted to a set of touched paths (files or directories) under the
+    user's directory, without scanning the whole tree. Used by the filesystem watcher.
+    Existing files are compared with the catalog like in sync_collection; a path that no
+    longer exists removes the file, or every file indexed under it for a directory.
+    :param directory: Root directory of the user's files (source_ids are relative to it)
+    :param user_id: the user these paths belong to
+    :param paths: Touched paths, absolute or relative to the current directory
+    :param workers: Number of parsing processes (default SYNC_WORKERS)
+    :param progress: Optional progress callback, see sync_collection
+    """
+    with sync_lock(directory, user_id):
+        catalog = DocumentCatalog(PSYCOPG2_CONNECTION_STRING)
+        indexed_files = catalog.get_indexed_files(user_id)
+        indexed_by_source = {f["source_id"]: f for f in indexed_files}
+
+        current_files = {}
+        to_delete = []
+        for path in sorted({Path(p) for p in paths}):
+            source_id = os.path.relpath(path, start=directory)
+            if source_id.startswith(os.pardir):
+                continue
+            if path.is_dir():
+                candidates = [p for p in path.rglob('*') if p.is_file()]
+            elif path.is_file():
+                candidates = [path]
+            else:
+                # vanished file or directory: drop everything that was indexed under it
+                to_delete.extend(
+                    indexed["source_id"] for indexed in indexed_files
+                    if indexed["source_id"] == source_id or indexed["source_id"].startswith(source_id + os.sep)
+                )
+                continue
+            for file_path in candidates:
+                if file_path.suffix.lower() not in ALLOWED_EXTENSIONS:
+                    continue
+                file_source_id = os.path.relpath(file_path, start=directory)
+                current_files[file_source_id] = catalog.describe_file(
+                    file_path, directory, user_id, indexed_by_source.get(file_source_id)
+                )
+
+        to_add = plan_changes(catalog, list(current_files.values()), indexed_by_source)
+        to_delete = [source_id for source_id in to_delete if source_id not in current_files]
+        if to_add or to_delete:
+            apply_changes(catalog, user_id, to_add, to_delete, workers, progress)
@@ -0,0 +1,227 @@
+"""
+Long-running sync daemon: watches data/<user_id>/ and feeds only the touched paths
+into incremental ingestion (sync_paths), instead of rescanning whole trees on /sync.
+
+Uses inotify-style events through watchdog when it is installed, and falls back to
+polling stat snapshots otherwise.
+
+    python -m src.ingestion.watcher --root data
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+from src.config import WATCH_DEBOUNCE_SECONDS, WATCH_QUEUE_SIZE, WATCH_POLL_INTERVAL
+from src.ingestion.sync import sync_collection, sync_paths
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class PathCoalescer:
+    """
+    Collects touched paths per user and releases them once no event arrived for
+    `debounce` seconds, so a burst (copy of a folder, editor saves) becomes one batch.
+    """
+
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._pending: Dict[str, Set[str]] = {}
+        self._last_event: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, paths):
+        with self._lock:
+            self._pending.setdefault(user_id, set()).update(paths)
+            self._last_event[user_id] = time.monotonic()
+
+    def pop_ready(self) -> List[Tuple[str, Set[str]]]:
+        """
+        Returns and forgets the batches of the users that have been quiet for `debounce` seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            ready = [user_id for user_id, last in self._last_event.items() if now - last >= self.debounce]
+            batches = [(user_id, self._pending.pop(user_id)) for user_id in ready]
+            for user_id in ready:
+                del self._last_event[user_id]
+            return batches
+
+    def put_back(self, user_id: str, paths: Set[str]):
+        """
+        Re-queue a batch that could not be dispatched; it is merged with newer events.
+        """
+        with self._lock:
+            self._pending.setdefault(user_id, set()).update(paths)
+            self._last_event.setdefault(user_id, time.monotonic())
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, on_paths):
+        self.on_paths = on_paths
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        # a file change also "modifies" its parent directories, syncing those would rescan the subtree
+        if event.is_directory and event.event_type == "modified":
+            return
+        paths = [event.src_path]
+        if getattr(event, "dest_path", None):
+            paths.append(event.dest_path)
+        self.on_paths(paths)
+
+
+class PollingSource:
+    """
+    Fallback event source: compares (size, mtime) snapshots of the tree every `interval` seconds.
+    Only stat calls, files are never read.
+    """
+
+    def __init__(self, root: str, interval: float, on_paths):
+        self.root = root
+        self.interval = interval
+        self.on_paths = on_paths
+        self._snapshot = self._take_snapshot()
+        self._stopped = threading.Event()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            snapshot = self._take_snapshot()
+            touched = [path for path, signature in snapshot.items() if self._snapshot.get(path) != signature]
+            touched.extend(path for path in self._snapshot if path not in snapshot)
+            self._snapshot = snapshot
+            if touched:
+                self.on_paths(touched)
+
+    def start(self):
+        threading.Thread(target=self._run, name="watch-polling", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class SyncDaemon:
+    """
+    Watches `root` (one sub-directory per user), debounces the events and hands the
+    batches to a single ingestion worker through a bounded queue. When the queue is
+    full, batches stay in the coalescer and keep absorbing new events (backpressure)
+    instead of piling up.
+    """
+
+    def __init__(self, root: str, debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 queue_size: int = WATCH_QUEUE_SIZE, poll_interval: float = WATCH_POLL_INTERVAL,
+                 force_polling: bool = False):
+        self.root = os.path.abspath(root)
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.coalescer = PathCoalescer(debounce)
+        self.queue: "queue.Queue[Tuple[str, Set[str]]]" = queue.Queue(maxsize=queue_size)
+        self._source = None
+
+    def on_paths(self, paths):
+        """
+        Route touched paths to their user (first directory level under root).
+        """
+        by_user: Dict[str, Set[str]] = {}
+        for path in paths:
+            relative = os.path.relpath(os.path.abspath(path), start=self.root)
+            parts = Path(relative).parts
+            if not parts or parts[0] == os.pardir or len(parts) < 2:
+                continue
+            by_user.setdefault(parts[0], set()).add(os.path.join(self.root, relative))
+        for user_id, user_paths in by_user.items():
+            self.coalescer.add(user_id, user_paths)
+
+    def _dispatch_loop(self):
+        while True:
+            for user_id, paths in self.coalescer.pop_ready():
+                try:
+                    self.queue.put_nowait((user_id, paths))
+                except queue.Full:
+                    self.coalescer.put_back(user_id, paths)
+            time.sleep(0.5)
+
+    def _worker_loop(self):
+        while True:
+            user_id, paths = self.queue.get()
+            try:
+                print(f"Watcher: {len(paths)} touched path(s) for user {user_id}")
+                sync_paths(os.path.join(self.root, user_id), user_id, paths)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    def initial_sync(self):
+        """
+        Catch up with the changes made while the daemon was not running (one full sync per user).
+        Call it after start(): the syncs of the watcher are serialized with it by sync_lock.
+        """
+        for entry in sorted(os.scandir(self.root), key=lambda e: e.name):
+            if entry.is_dir():
+                try:
+                    sync_collection(entry.path, entry.name)
+                except Exception:
+                    traceback.print_exc()
+
+    def start(self):
+        if Observer is not None and not self.force_polling:
+            self._source = Observer()
+            self._source.schedule(_EventHandler(self.on_paths), self.root, recursive=True)
+            print(f"Watching {self.root} (filesystem events)")
+        else:
+            self._source = PollingSource(self.root, self.poll_interval, self.on_paths)
+            print(f"Watching {self.root} (polling every {self.poll_interval}s)")
+        self._source.start()
+        threading.Thread(target=self._dispatch_loop, name="watch-dispatch", daemon=True).start()
+        threading.Thread(target=self._worker_loop, name="watch-ingest", daemon=True).start()
+
+    def stop(self):
+        if self._source is not None:
+            self._source.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch data/<user_id>/ and sync touched files continuously")
+    parser.add_argument("--root", default="data", help="Root directory containing one folder per user")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS, help="Quiet time before a batch is synced (s)")
+    parser.add_argument("--poll", action="store_true", help="Force the polling fallback")
+    parser.add_argument("--no-initial-sync", action="store_true", help="Skip the full sync of every user at startup")
+    args = parser.parse_args()
+
+    os.makedirs(args.root, exist_ok=True)
+    daemon = SyncDaemon(args.root, debounce=args.debounce, force_polling=args.poll)
+    # watch first: files changed while the initial sync runs are queued, not missed
+    daemon.start()
+    if not args.no_initial_sync:
+        daemon.initial_sync()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    redis = None
+    aioredis = None
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key text of a query: Unicode NFKC, case folded, whitespace collapsed, so that
+    "What is RAG ?" and "what is  RAG ?" share one embedding.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def query_key(model: str, text: str) -> str:
+    return f"{model}:{hashlib.sha256(normalize_query(text).encode('utf-8')).hexdigest()}"
+
+
+class MemoryBackend:
+    """
+    In-process LRU cache with a time to live: entries older than ttl seconds are treated
+    as missing, the least recently used entry is evicted above max_entries.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any):
+        self.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared backend of CachedQueryEmbeddings (any object with get/set/aget/aset fits).
+    Cache shared by the workers (uvicorn processes, API replicas) through Redis: vectors are
+    stored as float32 blobs with a TTL, Redis evicts according to its maxmemory-policy.
+    Requires the redis package (pip install redis).
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "rag:query-embedding:"):
+        if redis is None:
+            raise RuntimeError("QUERY_EMBEDDING_CACHE_REDIS_URL is set but the redis package is not installed")
+        self.url = url
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        # redis.asyncio clients are bound to an event loop, one per loop
+        self._async_clients = {}
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = aioredis.Redis.from_url(self.url)
+            self._async_clients[loop] = client
+        return client
+
+    @staticmethod
+    def _decode(blob) -> Optional[List[float]]:
+        if blob is None:
+            return None
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        return self._decode(self._client.get(self.prefix + key))
+
+    def set(self, key: str, vector: List[float]):
+        self._client.set(self.prefix + key, array("f", vector).tobytes(), ex=self.ttl)
+
+    async def aget(self, key: str) -> Optional[List[float]]:
+        return self._decode(await self._async_client().get(self.prefix + key))
+
+    async def aset(self, key: str, vector: List[float]):
+        await self._async_client().set(self.prefix + key, array("f", vector).tobytes(), ex=self.ttl)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper caching query embeddings, keyed by model and normalized query text:
+    a repeated question skips the embedding API round trip. Lookups go to the in-process
+    LRU first, then to the shared backend if one is configured (a shared hit is copied into
+    the LRU). A failing shared backend is skipped: the query is embedded as without cache.
+    Document embeddings (ingestion) are passed through, they have their own cache.
+    """
+
+    def __init__(self, embeddings: Embeddings, local: MemoryBackend, shared=None):
+        self.embeddings = embeddings
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.shared_errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return self.embeddings.model
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _shared_failed(self, e: Exception):
+        self._count("shared_errors")
+        print(f"Cache partagé des embeddings de requête indisponible : {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = query_key(self.model, text)
+        vector = self.local.get(key)
+        if vector is not None:
+            self._count("hits")
+            return vector
+        if self.shared is not None:
+            try:
+                vector = self.shared.get(key)
+            except Exception as e:
+                self._shared_failed(e)
+            if vector is not None:
+                self._count("shared_hits")
+                self.local.set(key, vector)
+                return vector
+
+        self._count("misses")
+        vector = self.embeddings.embed_query(text)
+        self.local.set(key, vector)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, vector)
+            except Exception as e:
+                self._shared_failed(e)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = query_key(self.model, text)
+        vector = self.local.get(key)
+        if vector is not None:
+            self._count("hits")
+            return vector
+        if self.shared is not None:
+            try:
+                vector = await self.shared.aget(key)
+            except Exception as e:
+                self._shared_failed(e)
+            if vector is not None:
+                self._count("shared_hits")
+                self.local.set(key, vector)
+                return vector
+
+        self._count("misses")
+        vector = await self.embeddings.aembed_query(text)
+        self.local.set(key, vector)
+        if self.shared is not None:
+            try:
+                await self.shared.aset(key, vector)
+            except Exception as e:
+                self._shared_failed(e)
+        return vector
+
+    def stats(self) -> Dict:
+        """
+        Returns the hit/miss counters of this process and the size of the local cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "shared_errors": self.shared_errors,
+                "entries": len(self.local),
+                "max_entries": self.local.max_entries,
+                "ttl": self.local.ttl,
+                "shared_backend": type(self.shared).__name__ if self.shared is not None else None,
+            }
@@ -3,11 +3,27 @@ from langchain_classic.chains import create_retrieval_chain
 from langchain_classic.chains.combine_documents import create_stuff_documents_chain
 from langchain_classic.prompts import ChatPromptTemplate
 from langchain_classic.retrievers import EnsembleRetriever
-import psycopg2
+import asyncio
+import functools
 import re
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Optional
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
-from src.config import PSYCOPG2_CONNECTION_STRING
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor, RunnableConfig, patch_config
+from src.config import (
+    PSYCOPG2_CONNECTION_STRING, query_embeddings, EMBEDDING_DIMENSIONS, HNSW_EF_SEARCH, IVFFLAT_PROBES,
+    VECTOR_EXACT_SEARCH_MAX_CHUNKS, VECTOR_ITERATIVE_SCAN, HYBRID_RETRIEVER, HYBRID_BM25_WEIGHT,
+    HYBRID_VECTOR_WEIGHT, HYBRID_RRF_C, answer_cache, RETRIEVER_TIMEOUT, RETRIEVER_THREADS,
+    RAG_CHAT_MODEL, RAG_ENGINE_MAX_USERS, RAG_WARMUP_TIMEOUT
+)
+from src.db.connection import get_scoped_connection
+from src.db.async_connection import async_scoped_connection
+from src.db.vector_index import embedding_expression
+from src.db.corpus_versions import get_corpus_version, aget_corpus_version
 
 def get_retriever(vector_store, k: int = 5, user_id: str = None):
     """
@@ -22,10 +38,33 @@ def get_retriever(vector_store, k: int = 5, user_id: str = None):
     )
 
 
+BM25_QUERY = """
+    SELECT document, cmetadata, paradedb.score(uuid) AS score
+    FROM langchain_pg_embedding
+    WHERE document @@@ %s AND user_id = %s
+    ORDER BY score DESC
+    LIMIT %s;
+"""
+
+# counting stops at the threshold, so large users cost at most that many index entries
+CHUNK_COUNT_QUERY = "SELECT count(*) FROM (SELECT 1 FROM langchain_pg_embedding WHERE user_id = %s LIMIT %s) AS chunks;"
+
+
+def to_documents(rows) -> list[Document]:
+    """
+    Documents from (document, cmetadata, ...) rows.
+    """
+    return [
+        Document(page_content=row[0], metadata=row[1] or {})
+        for row in rows
+    ]
+
+
 class PostgresBM25Retriever(BaseRetriever):
     """
     Ask directly the BM25 index (pg_search) created on langchain_pg_embedding.
     No corpus in memory: the lexical search is done on the Postgres side.
+    ainvoke runs the query on the psycopg 3 async pool, without blocking the event loop.
     """
     k: int = 5
     user_id: str
@@ -43,72 +82,482 @@ class PostgresBM25Retriever(BaseRetriever):
     def _get_relevant_documents(self, query: str, *, run_manager=None) -> list[Document]:
         sanitized_query = self._sanitize_query(query)
 
-        with psycopg2.connect(PSYCOPG2_CONNECTION_STRING) as conn:
+        with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, self.user_id) as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT document, cmetadata, paradedb.score(uuid) AS score
-                    FROM langchain_pg_embedding
-                    WHERE document @@@ %s AND cmetadata->>'user_id' = %s
-                    ORDER BY score DESC
-                    LIMIT %s;
-                    """,
-                    (sanitized_query, self.user_id, self.k)
-                )
+                cur.execute(BM25_QUERY, (sanitized_query, self.user_id, self.k))
+                rows = cur.fetchall()
+
+        return to_documents(rows)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list[Document]:
+        sanitized_query = self._sanitize_query(query)
+
+        async with async_scoped_connection(PSYCOPG2_CONNECTION_STRING, self.user_id) as conn:
+            cur = await conn.execute(BM25_QUERY, (sanitized_query, self.user_id, self.k))
+            rows = await cur.fetchall()
+
+        return to_documents(rows)
+
+
+class PostgresVectorRetriever(BaseRetriever):
+    """
+    Similarity search (cosine) in direct SQL on langchain_pg_embedding, so that it can use
+    the HNSW/IVFFlat index of src/db/vector_index.py, filtered on the user_id column.
+    hnsw.ef_search / ivfflat.probes are set per query with SET LOCAL semantics; they can be
+    overridden for one query: retriever.invoke(query, ef_search=200).
+    Users with fewer than exact_search_max_chunks chunks are searched exactly (their rows
+    come from the user_id index and are sorted by distance): exact recall, and no ANN
+    result lost to the user filter.
+    ainvoke embeds the query and searches without blocking the event loop.
+    """
+    k: int = 5
+    user_id: str
+    embeddings: Optional[Any] = None  # defaults to the cached query embeddings of src.config
+    ef_search: int = HNSW_EF_SEARCH
+    probes: int = IVFFLAT_PROBES
+    exact_search_max_chunks: int = VECTOR_EXACT_SEARCH_MAX_CHUNKS
+    dimensions: int = EMBEDDING_DIMENSIONS
+
+    def _ann_settings(self, ef_search: int = None, probes: int = None) -> list[tuple]:
+        """
+        (statement, parameters) setting the ANN search parameters for the current transaction.
+        """
+        settings = [(
+            "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true);",
+            (str(max(ef_search or self.ef_search, self.k)), str(probes or self.probes))
+        )]
+        if VECTOR_ITERATIVE_SCAN:
+            settings.append(("SELECT set_config('hnsw.iterative_scan', %s, true);", (VECTOR_ITERATIVE_SCAN,)))
+        return settings
+
+    def _search_query(self, exact: bool) -> str:
+        if exact:
+            # the untyped column does not match the indexed expression: no ANN index
+            distance = "embedding <=> %s::vector"
+        else:
+            distance = f"{embedding_expression(self.dimensions)} <=> %s::vector({int(self.dimensions)})"
+        return f"""
+            SELECT document, cmetadata, {distance} AS distance
+            FROM langchain_pg_embedding
+            WHERE user_id = %s
+            ORDER BY distance
+            LIMIT %s;
+        """
+
+    def _search_params(self, vector) -> tuple:
+        return "[" + ",".join(str(float(x)) for x in vector) + "]", self.user_id, self.k
+
+    def search_by_vector(self, vector, ef_search: int = None, probes: int = None,
+                         exact: bool = None) -> list[Document]:
+        """
+        :param vector: Embedding of the query
+        :param ef_search: HNSW candidate list size for this query (recall/latency trade-off)
+        :param probes: IVFFlat number of clusters visited for this query
+        :param exact: Force (True) or skip (False) the exact search, by default decided on the user's chunk count
+        :return: The k nearest chunks of the user
+        """
+        with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, self.user_id) as conn:
+            with conn.cursor() as cur:
+                if exact is None:
+                    cur.execute(CHUNK_COUNT_QUERY, (self.user_id, self.exact_search_max_chunks))
+                    exact = cur.fetchone()[0] < self.exact_search_max_chunks
+                if not exact:
+                    for statement, params in self._ann_settings(ef_search, probes):
+                        cur.execute(statement, params)
+                cur.execute(self._search_query(exact), self._search_params(vector))
+                rows = cur.fetchall()
+
+        return to_documents(rows)
+
+    async def asearch_by_vector(self, vector, ef_search: int = None, probes: int = None,
+                                exact: bool = None) -> list[Document]:
+        """
+        Async search_by_vector, on the psycopg 3 async pool.
+        """
+        async with async_scoped_connection(PSYCOPG2_CONNECTION_STRING, self.user_id) as conn:
+            if exact is None:
+                cur = await conn.execute(CHUNK_COUNT_QUERY, (self.user_id, self.exact_search_max_chunks))
+                exact = (await cur.fetchone())[0] < self.exact_search_max_chunks
+            if not exact:
+                for statement, params in self._ann_settings(ef_search, probes):
+                    await conn.execute(statement, params)
+            cur = await conn.execute(self._search_query(exact), self._search_params(vector))
+            rows = await cur.fetchall()
+
+        return to_documents(rows)
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None, ef_search: int = None,
+                                probes: int = None, exact: bool = None) -> list[Document]:
+        vector = (self.embeddings or query_embeddings).embed_query(query)
+        return self.search_by_vector(vector, ef_search=ef_search, probes=probes, exact=exact)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None, ef_search: int = None,
+                                       probes: int = None, exact: bool = None) -> list[Document]:
+        vector = await (self.embeddings or query_embeddings).aembed_query(query)
+        return await self.asearch_by_vector(vector, ef_search=ef_search, probes=probes, exact=exact)
+
+
+class PostgresHybridRetriever(BaseRetriever):
+    """
+    Hybrid retrieval in one SQL statement: the BM25 (pg_search) and vector (pgvector) top-k
+    lists are computed in CTEs and fused with the weighted Reciprocal Rank Fusion of
+    EnsembleRetriever: score = sum(weight / (rank + c)) over the lists, documents deduplicated
+    by content, ties kept in order of first appearance (BM25 list first), the metadata of
+    the first appearance kept. Components with a zero weight are not queried at all (their
+    documents would only come last with a score of 0 in EnsembleRetriever).
+    """
+    k: int = 5
+    user_id: str
+    weights: list[float] = [HYBRID_BM25_WEIGHT, HYBRID_VECTOR_WEIGHT]  # BM25, vector
+    c: int = HYBRID_RRF_C
+    vector: PostgresVectorRetriever  # vector search settings (k, ef_search, probes, exact fallback)
+
+    def _fused_query(self, query: str, vector=None, exact: bool = None) -> tuple:
+        """
+        Rows are numbered in the order of their subquery (the BM25 / vector query, ORDER BY ...
+        LIMIT k), so that ties get the same ranks as in the standalone queries.
+        :return: The fused statement and its parameters
+        """
+        bm25_weight, vector_weight = self.weights
+        ctes, ranked, params = [], [], []
+        if bm25_weight > 0:
+            ctes.append(f"""
+                bm25 AS (
+                    SELECT document, cmetadata, row_number() OVER () AS rank
+                    FROM ({BM25_QUERY.strip().rstrip(";")}) AS hits
+                )""")
+            params += [PostgresBM25Retriever._sanitize_query(query), self.user_id, self.k]
+            ranked.append("SELECT 0 AS list, rank, document, cmetadata, %s::float8 / (rank + %s) AS score FROM bm25")
+        if vector_weight > 0:
+            ctes.append(f"""
+                nearest AS (
+                    SELECT document, cmetadata, row_number() OVER () AS rank
+                    FROM ({self.vector._search_query(exact).strip().rstrip(";")}) AS hits
+                )""")
+            params += list(self.vector._search_params(vector))
+            ranked.append("SELECT 1 AS list, rank, document, cmetadata, %s::float8 / (rank + %s) AS score FROM nearest")
+        if bm25_weight > 0:
+            params += [bm25_weight, self.c]
+        if vector_weight > 0:
+            params += [vector_weight, self.c]
+        statement = f"""
+            WITH {",".join(ctes)},
+            ranked AS ({" UNION ALL ".join(ranked)})
+            SELECT document, (array_agg(cmetadata ORDER BY list, rank))[1] AS cmetadata, sum(score) AS score
+            FROM ranked
+            GROUP BY document
+            ORDER BY score DESC, min(list * %s + rank);
+        """
+        params.append(self.k + 1)
+        return statement, params
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list[Document]:
+        bm25_weight, vector_weight = self.weights
+        if bm25_weight <= 0 and vector_weight <= 0:
+            return []
+        vector = (self.vector.embeddings or query_embeddings).embed_query(query) if vector_weight > 0 else None
+
+        with get_scoped_connection(PSYCOPG2_CONNECTION_STRING, self.user_id) as conn:
+            with conn.cursor() as cur:
+                exact = None
+                if vector_weight > 0:
+                    cur.execute(CHUNK_COUNT_QUERY, (self.user_id, self.vector.exact_search_max_chunks))
+                    exact = cur.fetchone()[0] < self.vector.exact_search_max_chunks
+                    if not exact:
+                        for statement, params in self.vector._ann_settings():
+                            cur.execute(statement, params)
+                cur.execute(*self._fused_query(query, vector, exact))
                 rows = cur.fetchall()
 
-        return [
-            Document(page_content=row[0], metadata=row[1] or {})
-            for row in rows
+        return to_documents(rows)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list[Document]:
+        bm25_weight, vector_weight = self.weights
+        if bm25_weight <= 0 and vector_weight <= 0:
+            return []
+        vector = await (self.vector.embeddings or query_embeddings).aembed_query(query) if vector_weight > 0 else None
+
+        async with async_scoped_connection(PSYCOPG2_CONNECTION_STRING, self.user_id) as conn:
+            exact = None
+            if vector_weight > 0:
+                cur = await conn.execute(CHUNK_COUNT_QUERY, (self.user_id, self.vector.exact_search_max_chunks))
+                exact = (await cur.fetchone())[0] < self.vector.exact_search_max_chunks
+                if not exact:
+                    for statement, params in self.vector._ann_settings():
+                        await conn.execute(statement, params)
+            cur = await conn.execute(*self._fused_query(query, vector, exact))
+            rows = await cur.fetchall()
+
+        return to_documents(rows)
+
+
+# Shared by every ConcurrentEnsembleRetriever of the process, created on first use
+_retriever_executor = None
+_retriever_executor_lock = threading.Lock()
+
+
+def get_retriever_executor() -> ContextThreadPoolExecutor:
+    """
+    Returns the thread pool running the component searches of the sync ensemble path.
+    """
+    global _retriever_executor
+    with _retriever_executor_lock:
+        if _retriever_executor is None:
+            _retriever_executor = ContextThreadPoolExecutor(max_workers=RETRIEVER_THREADS, thread_name_prefix="retriever")
+        return _retriever_executor
+
+
+class ConcurrentEnsembleRetriever(EnsembleRetriever):
+    """
+    EnsembleRetriever whose component searches run concurrently, so a question costs the
+    slowest component instead of the sum: on the shared thread pool for invoke, with
+    asyncio.gather for ainvoke. Each component has its own timeout; a component that
+    times out or fails contributes no documents and the others are fused as usual
+    (partial results). The request fails only when every component failed.
+    A sync search that timed out cannot be interrupted: it finishes in its pool thread and
+    its result is dropped. ainvoke cancels it.
+    """
+    timeout: Optional[float] = RETRIEVER_TIMEOUT  # seconds per component, None to wait indefinitely
+
+    def _partial_results(self, results: list) -> list[list[Document]]:
+        """
+        Replace the failed components by empty lists, raise if all of them failed.
+        """
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        doc_lists = []
+        for retriever, result in zip(self.retrievers, results):
+            if isinstance(result, BaseException):
+                reason = "timeout" if isinstance(result, (TimeoutError, FutureTimeoutError)) else repr(result)
+                print(f"Retriever {type(retriever).__name__} ignoré ({reason}), résultats partiels")
+                result = []
+            doc_lists.append([doc if isinstance(doc, Document) else Document(page_content=doc) for doc in result])
+        return doc_lists
+
+    def rank_fusion(self, query: str, run_manager, *, config=None) -> list[Document]:
+        executor = get_retriever_executor()
+        futures = [
+            executor.submit(
+                retriever.invoke, query,
+                patch_config(config, callbacks=run_manager.get_child(tag=f"retriever_{i + 1}"))
+            )
+            for i, retriever in enumerate(self.retrievers)
         ]
+        # the components started together: each one gets `timeout` seconds from now
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        results = []
+        for future in futures:
+            try:
+                remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+                results.append(future.result(timeout=remaining))
+            except Exception as e:
+                future.cancel()
+                results.append(e)
+        return self.weighted_reciprocal_rank(self._partial_results(results))
+
+    async def arank_fusion(self, query: str, run_manager, *, config=None) -> list[Document]:
+        results = await asyncio.gather(
+            *[
+                asyncio.wait_for(
+                    retriever.ainvoke(query, patch_config(config, callbacks=run_manager.get_child(tag=f"retriever_{i + 1}"))),
+                    self.timeout
+                )
+                for i, retriever in enumerate(self.retrievers)
+            ],
+            return_exceptions=True
+        )
+        return self.weighted_reciprocal_rank(self._partial_results(results))
 
 
-def get_hybrid_retriever(vector_store, user_id: str, k: int = 5):
+def get_hybrid_retriever(vector_store, user_id: str, k: int = 5, weights: list[float] = None, mode: str = HYBRID_RETRIEVER):
     """
-    Hybrid retriever : BM25 (pg_search, in database) + vector similarity (pgvector),
-    merged by RRF via EnsembleRetriever.
+    Hybrid retriever : BM25 (pg_search, in database) + vector similarity (pgvector, ANN index),
+    merged by weighted RRF, in one SQL statement ("fused") or by running both searches
+    concurrently and fusing them like EnsembleRetriever ("ensemble").
+    :param weights: [BM25 weight, vector weight], HYBRID_BM25_WEIGHT / HYBRID_VECTOR_WEIGHT by default
+    :param mode: "fused" or "ensemble", HYBRID_RETRIEVER by default
     """
-    semantic_retriever = get_retriever(vector_store, k=k, user_id=user_id)
+    weights = weights or [HYBRID_BM25_WEIGHT, HYBRID_VECTOR_WEIGHT]  # à ajuster selon l'éval
+    semantic_retriever = PostgresVectorRetriever(k=k, user_id=user_id)
+    if mode == "fused":
+        return PostgresHybridRetriever(k=k, user_id=user_id, weights=weights, c=HYBRID_RRF_C, vector=semantic_retriever)
+
     bm25_retriever = PostgresBM25Retriever(k=k, user_id=user_id)
 
-    return EnsembleRetriever(
+    return ConcurrentEnsembleRetriever(
         retrievers=[bm25_retriever, semantic_retriever],
-        weights=[0.0, 1.0],  # à ajuster selon l'éval
+        weights=weights,
+        c=HYBRID_RRF_C,
     )
 
+RAG_PROMPT = """
+    Tu es un assistant qui répond à partir des documents fournis.
+    Réponds toujours si l'information peut être déduite raisonnablement du contexte.
+    Si tu es certain qu'elle n'est pas présente, dis "Information non disponible".
+        
+        Contexte: {context}
+        Question: {input}
+        """
+
+
+def build_chat_model():
+    return ChatMistralAI(model=RAG_CHAT_MODEL, temperature=0.2)
+
+
+def build_document_chain(chat_model=None):
+    """
+    Answer chain of the RAG: the retrieved chunks are stuffed into the prompt of the LLM.
+    :param chat_model: The LLM to use (a new Mistral client by default)
+    """
+    prompt = ChatPromptTemplate.from_template(RAG_PROMPT)
+    return create_stuff_documents_chain(
+        llm=chat_model or build_chat_model(),
+        prompt=prompt
+    )
+
+def build_retrieval_chain(vector_store, user_id, retriever=None):
+    """
+    Retrieval chain of the RAG: hybrid retrieval of the user's chunks, then answer by the LLM.
+    Builds a new LLM client and chain: for one-off use (evaluation), the API uses RAGEngine.
+    :param vector_store: The vector store containing the indexed documents
+    :param user_id: The user whose documents are searched
+    :param retriever: The retriever to use (optional)
+    :return: The chain, to invoke (or ainvoke) with {"input": question}
+    """
+    active_retriever = retriever if retriever is not None else get_hybrid_retriever(vector_store, user_id=user_id)
+
+    return create_retrieval_chain(
+         retriever=active_retriever,
+        combine_docs_chain=build_document_chain()
+    )
+
+
+class RAGEngine:
+    """
+    RAG of the application lifetime: the Mistral client (so its pool of keep-alive HTTP
+    connections), the prompt and the chains are built once. A request only brings its
+    question and user_id: the user's retriever is taken from an LRU (retrievers hold no
+    connection and no per-request state, they are shared by concurrent requests).
+    Answers are served from the answer cache while the user's corpus is unchanged.
+
+        engine = get_rag_engine()
+        response = await engine.agenerate(question, user_id)
+    """
+
+    def __init__(self, chat_model=None, retriever_factory=None, max_users: int = RAG_ENGINE_MAX_USERS):
+        """
+        :param chat_model: The LLM (a Mistral client by default)
+        :param retriever_factory: user_id -> retriever, get_hybrid_retriever by default
+        :param max_users: Number of user retrievers kept
+        """
+        self.chat_model = chat_model or build_chat_model()
+        self.retriever_factory = retriever_factory or (lambda user_id: get_hybrid_retriever(None, user_id=user_id))
+        self.retriever_for = functools.lru_cache(maxsize=max_users)(self.retriever_factory)
+        # the retrieval step reads the user from the chain input: {"input": question, "user_id": ...}
+        self.chain = create_retrieval_chain(
+            retriever=RunnableLambda(self._retrieve, afunc=self._aretrieve, name="user_retriever"),
+            combine_docs_chain=build_document_chain(self.chat_model)
+        )
+
+    def _retrieve(self, inputs: dict, config: RunnableConfig) -> list[Document]:
+        return self.retriever_for(inputs["user_id"]).invoke(inputs["input"], config)
+
+    async def _aretrieve(self, inputs: dict, config: RunnableConfig) -> list[Document]:
+        return await self.retriever_for(inputs["user_id"]).ainvoke(inputs["input"], config)
+
+    def generate(self, question: str, user_id: str) -> dict:
+        """
+        :param question: The question to be answered
+        :param user_id: The user whose documents are searched
+        :return: A dictionary containing the answer and the sources used
+        """
+        if answer_cache is not None:
+            version = get_corpus_version(PSYCOPG2_CONNECTION_STRING, user_id)
+            cached = answer_cache.get(user_id, version, question)
+            if cached is not None:
+                return cached
+
+        result = self.chain.invoke({"input": question, "user_id": user_id})
+        response = {"answer": result["answer"], "sources": result.get("context", [])}
+        if answer_cache is not None:
+            answer_cache.put(user_id, version, question, response)
+        return response
+
+    async def agenerate(self, question: str, user_id: str) -> dict:
+        """
+        Async generate: retrieval (psycopg 3 async pool) and LLM call run with ainvoke.
+        """
+        if answer_cache is not None:
+            version = await aget_corpus_version(PSYCOPG2_CONNECTION_STRING, user_id)
+            cached = await answer_cache.aget(user_id, version, question)
+            if cached is not None:
+                return cached
+
+        result = await self.chain.ainvoke({"input": question, "user_id": user_id})
+        response = {"answer": result["answer"], "sources": result.get("context", [])}
+        if answer_cache is not None:
+            await answer_cache.aput(user_id, version, question, response)
+        return response
+
+    async def awarm_up(self):
+        """
+        Open the HTTP connection to Mistral (DNS, TCP, TLS) before the first question, with
+        a request that consumes no tokens. Best effort: a failure only leaves the connection
+        to be opened by the first question.
+        """
+        client = getattr(self.chat_model, "async_client", None)
+        if client is None:
+            return
+        try:
+            response = await asyncio.wait_for(client.get("/models"), RAG_WARMUP_TIMEOUT)
+            print(f"Connexion Mistral ouverte ({response.status_code})")
+        except Exception as e:
+            print(f"Préchauffage de la connexion Mistral impossible : {e!r}")
+
+    async def aclose(self):
+        """
+        Close the HTTP clients of the LLM, at application shutdown.
+        """
+        async_client = getattr(self.chat_model, "async_client", None)
+        if async_client is not None:
+            await async_client.aclose()
+        client = getattr(self.chat_model, "client", None)
+        if client is not None:
+            client.close()
+
+
+# Process-wide engine, see get_rag_engine()
+_rag_engine = None
+_rag_engine_lock = threading.Lock()
+
+
+def get_rag_engine() -> RAGEngine:
+    """
+    Returns the process-wide RAG engine, built on first use (at startup for the API).
+    """
+    global _rag_engine
+    with _rag_engine_lock:
+        if _rag_engine is None:
+            _rag_engine = RAGEngine()
+        return _rag_engine
+
+
 def generate_response(vector_store, question, user_id, retriever=None):
     """
     Generate a response to a question using the vector store and a language model.
+    Without a retriever the process-wide RAGEngine answers (and its answer cache).
     :param vector_store: The vector store containing the indexed documents
     :param question: The question to be answered
     :param retriever: The retriever to use (optional)
     :return: A dictionary containing the answer and the sources used
     """
     try:
-        chat_model = ChatMistralAI(model="open-mistral-7b", temperature=0.2)
-
-        prompt=ChatPromptTemplate.from_template("""
-        Tu es un assistant qui répond à partir des documents fournis.
-        Réponds toujours si l'information peut être déduite raisonnablement du contexte.
-        Si tu es certain qu'elle n'est pas présente, dis "Information non disponible".
-            
-            Contexte: {context}
-            Question: {input}
-            """)
-        
-        document_chain= create_stuff_documents_chain(
-            llm=chat_model,
-            prompt=prompt
-        )
-
-        active_retriever = retriever if retriever is not None else get_hybrid_retriever(vector_store, user_id=user_id)
-
-        
-        retrieval_chain = create_retrieval_chain(
-             retriever=active_retriever,
-            combine_docs_chain=document_chain
-        )
+        if retriever is None:
+            return get_rag_engine().generate(question, user_id)
 
+        # a custom retriever (evaluation): one-off chain, its answers are not cached
+        retrieval_chain = build_retrieval_chain(vector_store, user_id, retriever)
         result = retrieval_chain.invoke({"input": question})
         return {"answer": result["answer"], "sources": result.get("context", [])}
     
@@ -116,4 +565,23 @@ def generate_response(vector_store, question, user_id, retriever=None):
         print(f"Error in generate_response: {e}")
         raise e
 
+async def agenerate_response(vector_store, question, user_id, retriever=None):
+    """
+    Async generate_response: retrieval (psycopg 3 async pool) and LLM call run with ainvoke,
+    so an API worker keeps serving other requests during the round trips.
+    :param vector_store: The vector store containing the indexed documents
+    :param question: The question to be answered
+    :param retriever: The retriever to use (optional)
+    :return: A dictionary containing the answer and the sources used
+    """
+    try:
+        if retriever is None:
+            return await get_rag_engine().agenerate(question, user_id)
 
+        retrieval_chain = build_retrieval_chain(vector_store, user_id, retriever)
+        result = await retrieval_chain.ainvoke({"input": question})
+        return {"answer": result["answer"], "sources": result.get("context", [])}
+    
+    except Exception as e:
+        print(f"Error in agenerate_response: {e}")
+        raise e
@@ -0,0 +1,109 @@
+import uuid
+from urllib.parse import quote
+import psycopg2
+import pytest
+from src.config import PSYCOPG2_CONNECTION_STRING
+from src.db.chunk_writer import ChunkWriter
+from src.db.partitions import DEFAULT_PARTITION, partition_chunks, user_partition_name
+
+
+@pytest.fixture
+def chunk_db():
+    """
+    Connection strings of a throw-away schema holding a chunk table with the generated
+    user_id/source_id/chunk_hash columns, dropped after the test. Each application name
+    gets its own connection pool, like a separate process would.
+    """
+    schema = f"test_chunks_{uuid.uuid4().hex[:12]}"
+    try:
+        conn = psycopg2.connect(PSYCOPG2_CONNECTION_STRING)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres unavailable: {e}")
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE SCHEMA {schema};
+            SET search_path TO {schema}, public;
+            CREATE TABLE langchain_pg_collection (uuid uuid PRIMARY KEY, name varchar, cmetadata json);
+            INSERT INTO langchain_pg_collection VALUES (gen_random_uuid(), 'test_collection', '{{}}');
+            CREATE TABLE langchain_pg_embedding (
+                collection_id uuid REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+                embedding vector, document varchar, cmetadata json, custom_id varchar,
+                uuid uuid PRIMARY KEY,
+                user_id text GENERATED ALWAYS AS (cmetadata->>'user_id') STORED,
+                source_id text GENERATED ALWAYS AS (cmetadata->>'source_id') STORED,
+                chunk_hash text GENERATED ALWAYS AS (cmetadata->>'chunk_hash') STORED
+            );
+            CREATE TABLE corpus_versions (LIKE public.corpus_versions INCLUDING ALL);
+        """)
+    try:
+        options = quote(f"-csearch_path={schema},public")
+        yield lambda name: f"{PSYCOPG2_CONNECTION_STRING}?options={options}&application_name={name}", conn
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE;")
+        conn.close()
+
+
+def write_chunks(connection_string, user_id, texts):
+    with ChunkWriter(connection_string, user_id) as writer:
+        writer.write(
+            texts,
+            [[0.1, 0.2, 0.3]] * len(texts),
+            [{"user_id": user_id, "source_id": "a.txt", "chunk_hash": text} for text in texts],
+        )
+
+
+def stored_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tableoid::regclass::text, user_id, chunk_hash FROM langchain_pg_embedding ORDER BY chunk_hash;")
+        return cur.fetchall()
+
+
+@pytest.mark.parametrize("method", ["list", "hash"])
+def test_write_to_partitioned_table(chunk_db, method):
+    connect, conn = chunk_db
+    write_chunks(connect("before"), "alice", ["a1"])
+
+    assert partition_chunks(connect("cli"), method=method, partitions=2)
+    # new sessions: their staging table gets the NOT NULL user_id of the partitioned table
+    write_chunks(connect("after"), "alice", ["a2"])
+    write_chunks(connect("after"), "bob", ["b1", "b2"])
+
+    rows = stored_rows(conn)
+    assert [(user_id, chunk_hash) for _, user_id, chunk_hash in rows] == [
+        ("alice", "a1"), ("alice", "a2"), ("bob", "b1"), ("bob", "b2"),
+    ]
+    if method == "list":
+        assert {(table, user_id) for table, user_id, _ in rows} == {
+            (user_partition_name("alice"), "alice"), (user_partition_name("bob"), "bob"),
+        }
+
+
+def test_writer_started_before_partitioning(chunk_db):
+    # a writer that was already running when `partitions enable` ran in another process
+    connect, conn = chunk_db
+    write_chunks(connect("writer"), "alice", ["a1"])
+
+    assert partition_chunks(connect("cli"), method="list")
+    write_chunks(connect("writer"), "carol", ["c1"])
+
+    tables = {user_id: table for table, user_id, _ in stored_rows(conn)}
+    assert tables["carol"] == user_partition_name("carol") != DEFAULT_PARTITION
+
+
+def test_update_metadata_keeps_the_row(chunk_db):
+    # a chunk moved to another page: its metadata is rewritten, not its row or embedding
+    connect, conn = chunk_db
+    write_chunks(connect("writer"), "alice", ["a1", "a2"])
+    with conn.cursor() as cur:
+        cur.execute("SELECT chunk_hash, uuid FROM langchain_pg_embedding;")
+        rows = dict(cur.fetchall())
+
+    with ChunkWriter(connect("writer"), "alice") as writer:
+        writer.update_metadata("a1", {"user_id": "alice", "source_id": "a.txt", "chunk_hash": "a1", "page": 2})
+    assert writer.updated == 1
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT chunk_hash, uuid, cmetadata->>'page' FROM langchain_pg_embedding ORDER BY chunk_hash;")
+        assert cur.fetchall() == [("a1", rows["a1"], "2"), ("a2", rows["a2"], None)]
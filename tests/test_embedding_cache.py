@@ -0,0 +1,52 @@
+import sqlite3
+from langchain_core.documents import Document
+import src.ingestion.embedding_cache as embedding_cache
+import src.ingestion.loaders as loaders
+
+
+class FakeEmbeddings:
+    model = "fake"
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts += texts
+        return [[float(len(text))] for text in texts]
+
+
+def chunks(*texts):
+    return [Document(page_content=text, metadata={"chunk_hash": loaders.get_chunk_hash(text)}) for text in texts]
+
+
+def test_cache_errors_fall_through_to_the_model(tmp_path, monkeypatch):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(loaders, "embeddings", fake)
+    monkeypatch.setattr(loaders, "shared_embeddings", None)
+    monkeypatch.setattr(embedding_cache, "BUSY_TIMEOUT", 0.1)
+    path = str(tmp_path / "embeddings.sqlite3")
+    monkeypatch.setattr(loaders, "embedding_cache", embedding_cache.EmbeddingCache(path, 10 ** 9))
+
+    # another process holds the write lock: the vectors are computed, not cached
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")
+    assert loaders.embed_chunks(chunks("a", "bb")) == [[1.0], [2.0]]
+    other.rollback()
+    other.close()
+
+    assert loaders.embed_chunks(chunks("a", "bb")) == [[1.0], [2.0]]
+    assert loaders.embed_chunks(chunks("a", "bb")) == [[1.0], [2.0]]
+    assert fake.texts == ["a", "bb", "a", "bb"]
+
+
+def test_unreadable_cache_file_is_skipped(tmp_path, monkeypatch):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(loaders, "embeddings", fake)
+    monkeypatch.setattr(loaders, "shared_embeddings", None)
+    path = tmp_path / "embeddings.sqlite3"
+    path.write_bytes(b"x" * 4096)
+    monkeypatch.setattr(loaders, "embedding_cache", None)
+    monkeypatch.setattr(loaders, "EMBEDDING_CACHE_PATH", str(path))
+
+    assert loaders.embed_chunks(chunks("a")) == [[1.0]]
+    assert fake.texts == ["a"]
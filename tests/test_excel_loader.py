@@ -0,0 +1,88 @@
+import datetime
+import openpyxl
+import pandas as pd
+from src.ingestion.loaders import excel_rows_to_text, iter_excel_blocks, parse_excel
+
+
+def write_workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "sheet"
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def rows_text(path, rows_per_block=5000):
+    return [text for _, block in iter_excel_blocks(path, rows_per_block) for text in excel_rows_to_text(block)]
+
+
+def read_excel_text(path):
+    """
+    Row texts of the previous path: pandas.read_excel then ' | '.join(map(str, row)).
+    """
+    df = pd.read_excel(path)
+    return df.apply(lambda row: " | ".join(map(str, row)), axis=1).tolist()
+
+
+def test_empty_date_and_number_cells(tmp_path):
+    path = write_workbook(tmp_path / "empty.xlsx", [["name", "score", "date"], ["bob", None, None]])
+
+    chunks = list(parse_excel(str(path), "user"))
+
+    assert [chunk.page_content for chunk in chunks] == ["bob | nan | nan"]
+
+
+def test_row_text_unchanged(tmp_path):
+    path = write_workbook(tmp_path / "types.xlsx", [
+        ["name", "score", "date", "ratio"],
+        ["alice", 3, datetime.datetime(2024, 1, 2), 1.5],
+        ["bob", None, None, None],
+        ["carl", 4, datetime.datetime(2024, 3, 4, 10, 30), True],
+    ])
+
+    assert rows_text(path) == read_excel_text(path)
+    assert rows_text(path)[0] == "alice | 3.0 | 2024-01-02 00:00:00 | 1.5"
+
+
+def test_same_columns_across_blocks(tmp_path):
+    # third column without header, empty in the first block only
+    path = write_workbook(tmp_path / "blocks.xlsx", [
+        ["name", "score"],
+        ["alice", 1.5],
+        ["bob", 2.5, None],
+        ["carl", 3.5, "note"],
+    ])
+
+    blocks = [block for _, block in iter_excel_blocks(path, rows_per_block=1)]
+
+    assert [list(block.columns) for block in blocks] == [["name", "score", "Unnamed: 2"]] * 3
+    assert rows_text(path, rows_per_block=1) == rows_text(path) == read_excel_text(path)
+
+
+def test_types_inferred_over_the_whole_column(tmp_path):
+    # int column with a blank, then a float, after the first block: read_excel types it float
+    path = write_workbook(tmp_path / "later.xlsx", [
+        ["name", "count"],
+        ["r0", 0], ["r1", 1], ["r2", 2], ["r3", None], ["r4", 4.5],
+    ])
+
+    assert rows_text(path, rows_per_block=2) == rows_text(path) == read_excel_text(path)
+    assert rows_text(path, rows_per_block=2)[0] == "r0 | 0.0"
+
+
+def test_numeric_rows_rendered_with_a_common_type(tmp_path):
+    # with only numeric columns, apply(axis=1) upcast each row: ints next to floats read 1.0
+    path = write_workbook(tmp_path / "numeric.xlsx", [["count", "ratio"], [1, 1.5], [2, None]])
+
+    assert rows_text(path, rows_per_block=1) == read_excel_text(path) == ["1.0 | 1.5", "2.0 | nan"]
+
+
+def test_blank_rows_only_count_inside_the_sheet(tmp_path):
+    # a blank row between filled rows makes read_excel type the int column float, trailing ones do not
+    inside = write_workbook(tmp_path / "inside.xlsx", [["name", "count"], ["r0", 1], [None, None], ["r1", 2]])
+    trailing = write_workbook(tmp_path / "trailing.xlsx", [["name", "count"], ["r0", 1], ["r1", 2], [None, None]])
+
+    assert rows_text(inside, rows_per_block=1) == rows_text(inside) == ["r0 | 1.0", "r1 | 2.0"]
+    assert rows_text(trailing, rows_per_block=1) == rows_text(trailing) == read_excel_text(trailing) == ["r0 | 1", "r1 | 2"]